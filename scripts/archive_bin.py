@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Almacén binario compacto del histórico (complemento del CSV).
+
+Formato: cabecera MAGIC (8 bytes) + registros de ancho fijo little-endian
+ordenados por tiempo, cada uno (int32 horas desde epoch UTC, int16 décimas
+de ºC) = 6 bytes. date_local/time_local no se guardan: se derivan del
+instante. Se lee con mmap y búsqueda binaria, sin parsear texto.
+
+Uso:
+    python scripts/archive_bin.py build            # regenera el .bin desde el CSV
+    python scripts/archive_bin.py dump [--from ISO] [--to ISO]
+"""
+import argparse, bisect, csv, mmap, os, struct, sys
+from datetime import datetime, timezone
+
+ARCHIVE = "docs/data/9091R_temp_history.csv"
+ARCHIVE_BIN = "docs/data/9091R_temp_history.bin"
+MAGIC = b"TEMPH1\x00\x00"
+RECORD = struct.Struct("<ih")
+
+
+# ---------- Conversión ----------
+def _epoch_hours(iso: str) -> int:
+    dt = datetime.fromisoformat(iso.replace("Z", "+00:00"))
+    return int(dt.timestamp()) // 3600
+
+def row_to_record(row):
+    """Fila del CSV (dict) -> (horas_epoch, décimas). Los minutos se truncan."""
+    return _epoch_hours(row["datetime_utc"]), int(round(float(row["temp_c"]) * 10))
+
+def record_to_pair(rec):
+    hours, tenths = rec
+    return datetime.fromtimestamp(hours * 3600, tz=timezone.utc), tenths / 10
+
+
+# ---------- Lectura ----------
+class BinArchive:
+    """Vista mmap de solo lectura; indexable como secuencia de horas_epoch."""
+
+    def __init__(self, path=ARCHIVE_BIN):
+        self._f = open(path, "rb")
+        size = os.fstat(self._f.fileno()).st_size
+        self._mm = mmap.mmap(self._f.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        if size and self._mm[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise RuntimeError(f"{path}: no es un histórico binario (cabecera inesperada)")
+        self._n = max(0, size - len(MAGIC)) // RECORD.size
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if isinstance(self._mm, mmap.mmap):
+            self._mm.close()
+        self._f.close()
+
+    def __len__(self):
+        return self._n
+
+    def __getitem__(self, i):
+        return self.record(i)[0]
+
+    def record(self, i):
+        return RECORD.unpack_from(self._mm, len(MAGIC) + i * RECORD.size)
+
+    def slice(self, start=None, end=None):
+        """Registros de las horas que solapan [start, end) (datetime aware o None)."""
+        lo = 0 if start is None else bisect.bisect_left(self, int(start.timestamp()) // 3600)
+        hi = self._n if end is None else bisect.bisect_left(self, -(-int(end.timestamp()) // 3600))
+        return [self.record(i) for i in range(lo, hi)]
+
+
+# ---------- Escritura ----------
+def write_bin(records, path=ARCHIVE_BIN):
+    """Reescribe el fichero completo con `records` (ordenados y sin duplicados)."""
+    with open(path, "wb") as f:
+        f.write(MAGIC)
+        for rec in records:
+            f.write(RECORD.pack(*rec))
+
+def merge_bin(records, path=ARCHIVE_BIN):
+    """
+    Inserta/actualiza `records` tocando solo la cola del fichero a partir del
+    primer registro solapado. Devuelve el nº de registros reescritos o None
+    si el fichero no existe (hay que construirlo con build_from_csv).
+    """
+    if not records:
+        return 0
+    if not os.path.exists(path):
+        return None
+    first = min(h for h, _ in records)
+    with BinArchive(path) as arch:
+        lo = bisect.bisect_left(arch, first)
+        tail = {h: t for h, t in (arch.record(i) for i in range(lo, len(arch)))}
+    tail.update(dict(records))
+    with open(path, "r+b") as f:
+        f.seek(len(MAGIC) + lo * RECORD.size)
+        f.truncate()
+        f.write(b"".join(RECORD.pack(h, tail[h]) for h in sorted(tail)))
+    return len(tail)
+
+def build_from_csv(csv_path=ARCHIVE, path=ARCHIVE_BIN):
+    with open(csv_path, encoding="utf-8") as f:
+        by_hour = dict(row_to_record(r) for r in csv.DictReader(f))
+    write_bin(sorted(by_hour.items()), path)
+    return len(by_hour)
+
+
+# ---------- Main ----------
+def _parse_iso(s):
+    return datetime.fromisoformat(s.replace("Z", "+00:00")).astimezone(timezone.utc) if s else None
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Histórico binario compacto")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    b = sub.add_parser("build", help="regenera el .bin desde el CSV")
+    b.add_argument("--csv", default=ARCHIVE)
+    b.add_argument("--out", default=ARCHIVE_BIN)
+    d = sub.add_parser("dump", help="vuelca un rango como CSV datetime_utc,temp_c")
+    d.add_argument("--bin", default=ARCHIVE_BIN)
+    d.add_argument("--from", dest="start")
+    d.add_argument("--to", dest="end")
+    args = ap.parse_args(argv)
+
+    if args.cmd == "build":
+        n = build_from_csv(args.csv, args.out)
+        print(f"OK: {n} registros -> {args.out} ({len(MAGIC) + n * RECORD.size} bytes)")
+        return
+
+    w = csv.writer(sys.stdout)
+    w.writerow(["datetime_utc", "temp_c"])
+    with BinArchive(args.bin) as arch:
+        for rec in arch.slice(_parse_iso(args.start), _parse_iso(args.end)):
+            ts, temp = record_to_pair(rec)
+            w.writerow([ts.isoformat().replace("+00:00", "Z"), f"{temp:.1f}"])
+
+if __name__ == "__main__":
+    main()
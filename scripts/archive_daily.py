@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Agregados diarios (día local Europe/Madrid) del histórico horario:
+mínimo, máximo (con su instante UTC), media y nº de observaciones.
+update_archive.py --daily los recalcula solo para los días que tocan las
+filas nuevas; el dashboard los lee en lugar de recalcularlos en el navegador.
+
+Uso:
+    python scripts/archive_daily.py build      # regenera el fichero desde el CSV histórico
+"""
+import argparse, csv, os
+from datetime import date, datetime, timezone
+from zoneinfo import ZoneInfo
+
+ARCHIVE = "docs/data/9091R_temp_history.csv"
+DAILY = "docs/data/9091R_daily.csv"
+TZ_LOCAL = ZoneInfo("Europe/Madrid")
+FIELDS = ["date_local","min_c","min_utc","max_c","max_utc","mean_c","count"]
+
+
+def day_start_utc(day: str) -> str:
+    """Inicio (datetime_utc ISO 'Z') del día local 'YYYY-MM-DD'."""
+    d = date.fromisoformat(day)
+    start = datetime(d.year, d.month, d.day, tzinfo=TZ_LOCAL).astimezone(timezone.utc)
+    return start.isoformat().replace("+00:00", "Z")
+
+def aggregate(rows, days=None):
+    """
+    rows: filas del histórico (dicts) ordenadas por datetime_utc.
+    Devuelve { date_local: fila agregada } para `days` (o todos si None).
+    En empates gana la primera observación del día, como en el dashboard.
+    """
+    acc = {}
+    for r in rows:
+        day = r["date_local"]
+        if days is not None and day not in days:
+            continue
+        t = float(r["temp_c"])
+        a = acc.get(day)
+        if a is None:
+            acc[day] = a = {"min": (t, r["datetime_utc"]), "max": (t, r["datetime_utc"]), "sum": 0.0, "n": 0}
+        if t < a["min"][0]: a["min"] = (t, r["datetime_utc"])
+        if t > a["max"][0]: a["max"] = (t, r["datetime_utc"])
+        a["sum"] += t
+        a["n"] += 1
+    return {
+        day: {
+            "date_local": day,
+            "min_c": f"{a['min'][0]:.1f}", "min_utc": a["min"][1],
+            "max_c": f"{a['max'][0]:.1f}", "max_utc": a["max"][1],
+            "mean_c": f"{a['sum'] / a['n']:.2f}", "count": a["n"],
+        }
+        for day, a in acc.items()
+    }
+
+def _read(path):
+    if not os.path.exists(path): return []
+    with open(path, encoding="utf-8") as f:
+        return list(csv.DictReader(f))
+
+def write_daily(by_day, path=DAILY):
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        w = csv.DictWriter(f, fieldnames=FIELDS)
+        w.writeheader()
+        w.writerows(by_day[d] for d in sorted(by_day))
+
+def merge_daily(rows, days, path=DAILY):
+    """
+    Recalcula los `days` a partir de `rows` (que deben contener todas las
+    observaciones de esos días) y los fusiona en el fichero. Devuelve None si
+    el fichero no existe todavía (usar build_from_csv).
+    """
+    if not os.path.exists(path):
+        return None
+    by_day = {r["date_local"]: r for r in _read(path)}
+    by_day.update(aggregate(rows, set(days)))
+    write_daily(by_day, path)
+    return sorted(days)
+
+def build_from_csv(csv_path=ARCHIVE, path=DAILY):
+    by_day = aggregate(_read(csv_path))
+    write_daily(by_day, path)
+    return by_day
+
+
+# ---------- Main ----------
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Agregados diarios del histórico")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    b = sub.add_parser("build", help="regenera el fichero de agregados desde el CSV histórico")
+    b.add_argument("--csv", default=ARCHIVE)
+    b.add_argument("--out", default=DAILY)
+    args = ap.parse_args(argv)
+
+    by_day = build_from_csv(args.csv, args.out)
+    print(f"OK: {len(by_day)} días -> {args.out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Histórico particionado por meses (UTC): un CSV por mes en SHARD_DIR
+(p.ej. docs/data/9091R/2025-11.csv) más un manifest.json con, por shard,
+su nº de filas y los datetime_utc mínimo/máximo. Una ejecución diaria solo
+reescribe los meses que tocan las filas nuevas y los lectores descargan
+únicamente los shards que solapan el rango pedido.
+
+Uso:
+    python scripts/archive_shards.py build     # regenera shards+manifest desde el CSV histórico
+"""
+import argparse, csv, json, os
+from datetime import datetime, timezone
+
+ARCHIVE = "docs/data/9091R_temp_history.csv"
+SHARD_DIR = "docs/data/9091R"
+MANIFEST = "manifest.json"
+FIELDS = ["date_local","time_local","datetime_utc","temp_c","source"]
+
+
+def shard_key(row) -> str:
+    """'YYYY-MM' (UTC) a partir de datetime_utc."""
+    return row["datetime_utc"][:7]
+
+def shard_path(key, shard_dir=SHARD_DIR):
+    return os.path.join(shard_dir, f"{key}.csv")
+
+def _read(path):
+    if not os.path.exists(path): return []
+    with open(path, encoding="utf-8") as f:
+        return list(csv.DictReader(f))
+
+def _write(path, rows):
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        w = csv.DictWriter(f, fieldnames=FIELDS)
+        w.writeheader()
+        w.writerows(rows)
+
+
+# ---------- Manifest ----------
+def load_manifest(shard_dir=SHARD_DIR):
+    path = os.path.join(shard_dir, MANIFEST)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def write_manifest(entries, shard_dir=SHARD_DIR):
+    """entries: { 'YYYY-MM': {rows, min_utc, max_utc} }"""
+    manifest = {
+        "fields": FIELDS,
+        "updated_utc": datetime.now(timezone.utc).replace(microsecond=0).isoformat().replace("+00:00", "Z"),
+        "shards": [
+            {"month": k, "file": f"{k}.csv", **entries[k]} for k in sorted(entries)
+        ],
+    }
+    tmp = os.path.join(shard_dir, MANIFEST + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1)
+        f.write("\n")
+    os.replace(tmp, os.path.join(shard_dir, MANIFEST))
+    return manifest
+
+def _entry(rows):
+    return {"rows": len(rows), "min_utc": rows[0]["datetime_utc"], "max_utc": rows[-1]["datetime_utc"]}
+
+
+# ---------- Escritura ----------
+def merge_shards(rows, shard_dir=SHARD_DIR):
+    """
+    Inserta/actualiza `rows` leyendo y reescribiendo solo sus meses. Devuelve
+    la lista de meses tocados, o None si aún no hay manifest (usar build).
+    """
+    manifest = load_manifest(shard_dir)
+    if manifest is None:
+        return None
+    entries = {s["month"]: {k: s[k] for k in ("rows", "min_utc", "max_utc")} for s in manifest["shards"]}
+
+    by_month = {}
+    for r in rows:
+        by_month.setdefault(shard_key(r), []).append(r)
+    for key, new in by_month.items():
+        path = shard_path(key, shard_dir)
+        by_ts = {r["datetime_utc"]: r for r in _read(path)}
+        for r in new:
+            by_ts[r["datetime_utc"]] = r
+        merged = [by_ts[k] for k in sorted(by_ts)]
+        _write(path, merged)
+        entries[key] = _entry(merged)
+    write_manifest(entries, shard_dir)
+    return sorted(by_month)
+
+def build_from_csv(csv_path=ARCHIVE, shard_dir=SHARD_DIR):
+    os.makedirs(shard_dir, exist_ok=True)
+    by_month = {}
+    for r in _read(csv_path):
+        by_month.setdefault(shard_key(r), {})[r["datetime_utc"]] = r
+    entries = {}
+    for key, by_ts in by_month.items():
+        merged = [by_ts[k] for k in sorted(by_ts)]
+        _write(shard_path(key, shard_dir), merged)
+        entries[key] = _entry(merged)
+    write_manifest(entries, shard_dir)
+    return entries
+
+
+# ---------- Lectura ----------
+def shards_for_range(start=None, end=None, shard_dir=SHARD_DIR):
+    """Rutas de los shards cuyo [min_utc, max_utc] solapa [start, end] (ISO 'Z' o None)."""
+    manifest = load_manifest(shard_dir) or {"shards": []}
+    return [
+        os.path.join(shard_dir, s["file"]) for s in manifest["shards"]
+        if (end is None or s["min_utc"] <= end) and (start is None or s["max_utc"] >= start)
+    ]
+
+
+# ---------- Main ----------
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Histórico particionado por meses")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    b = sub.add_parser("build", help="regenera shards y manifest desde el CSV histórico")
+    b.add_argument("--csv", default=ARCHIVE)
+    b.add_argument("--dir", default=SHARD_DIR)
+    args = ap.parse_args(argv)
+
+    entries = build_from_csv(args.csv, args.dir)
+    print(f"OK: {len(entries)} shards, {sum(e['rows'] for e in entries.values())} filas -> {args.dir}")
+
+if __name__ == "__main__":
+    main()
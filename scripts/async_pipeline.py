@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Variante de pipeline.py para cientos de estaciones: tres etapas asyncio
+solapadas con colas acotadas (contrapresión, memoria limitada).
+
+  descarga  -> hasta --concurrency peticiones en vuelo (hilos con la sesión compartida)
+  parseo    -> ProcessPoolExecutor con --workers procesos (BeautifulSoup es CPU);
+               las disposiciones de tabla nuevas vuelven al padre, que las
+               cuenta (new_layouts) y guarda la caché una sola vez
+  escritura -> una sola tarea que fusiona en los históricos por lotes de --batch
+
+Uso:
+    python scripts/async_pipeline.py [--stations scripts/stations.json] [--concurrency 16]
+                                     [--workers N] [--queue 32] [--batch 20] [--hourly-out]
+"""
+import argparse, asyncio, os, sys, time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import fetch_aemet_9091R
+import update_archive
+from update_archive import ARCHIVE_PATTERN
+from collect_stations import STATIONS, load_stations, make_session
+from fetch_aemet_9091R import (
+    add_layouts, csv_records, ensure_dirs, fetch_html, fetch_html_conditional, fingerprint_file,
+    fingerprint_pairs, load_http_cache, parse_aemet_html_last24, pool_report, save_http_cache,
+    set_step_output, start_run, take_new_layouts, write_csv, LAYOUT_STATS,
+)
+
+CONCURRENCY = 16
+QUEUE = 32   # páginas pendientes como máximo en cada cola entre etapas
+BATCH = 20   # estaciones por lote de escritura
+_DONE = object()
+
+
+def _init_parse_worker():
+    # el hijo lee la caché de disposiciones pero no la escribe: devuelve las nuevas
+    fetch_aemet_9091R.LAYOUT_AUTOSAVE = False
+
+def _parse_page(html):
+    """En el proceso hijo: (pares, {firma: disposición} nuevas desde la última página)."""
+    return parse_aemet_html_last24(html), take_new_layouts()
+
+
+class AsyncPipeline:
+    def __init__(self, stations, concurrency=CONCURRENCY, workers=None, queue=QUEUE, batch=BATCH,
+                 hourly_out=False, cache=None, derived=None):
+        self.stations = stations
+        self.concurrency = concurrency
+        self.workers = workers or os.cpu_count() or 1
+        self.queue = queue
+        self.batch = batch
+        self.hourly_out = hourly_out
+        self.cache = cache
+        self.derived = derived or {}
+        self.session = make_session(concurrency)
+        self.results = {}   # id -> nº registros | None (sin cambios) | Exception
+        self.layouts = {}   # firmas de tabla nuevas vistas por los procesos de parseo
+
+    # ---------- Etapas ----------
+    async def fetch(self, sid, io_pool, sem, parse_q):
+        st = self.stations[sid]
+        loop = asyncio.get_running_loop()
+        async with sem:
+            try:
+                if self.cache is None:
+                    html, entry = await loop.run_in_executor(io_pool, fetch_html, st["url"], self.session), None
+                else:
+                    prev = self.cache.get(st["url"]) if not self.hourly_out or os.path.exists(st["out"]) else None
+                    html, entry = await loop.run_in_executor(
+                        io_pool, fetch_html_conditional, st["url"], self.session, prev)
+            except Exception as e:
+                self.results[sid] = e
+                return
+        if html is None:
+            self.results[sid] = None
+            return
+        await parse_q.put((sid, html, entry))  # espera si el parseo va por detrás
+
+    async def parse(self, pool, parse_q, write_q):
+        loop = asyncio.get_running_loop()
+        while (item := await parse_q.get()) is not _DONE:
+            sid, html, entry = item
+            try:
+                pairs, layouts = await loop.run_in_executor(pool, _parse_page, html)
+                self.layouts.update(layouts)
+                if not pairs:
+                    raise RuntimeError("No se obtuvieron registros")
+            except Exception as e:
+                self.results[sid] = e
+                continue
+            await write_q.put((sid, pairs, entry))
+
+    async def write(self, write_q):
+        done = False
+        while not done:
+            batch = []
+            item = await write_q.get()
+            # además de la primera, lo que ya esté esperando (hasta --batch)
+            while True:
+                if item is _DONE:
+                    done = True
+                    break
+                batch.append(item)
+                if len(batch) >= self.batch or write_q.empty():
+                    break
+                item = write_q.get_nowait()
+            if batch:
+                await asyncio.to_thread(self._write_batch, batch)
+
+    def _write_batch(self, batch):
+        for sid, pairs, entry in batch:
+            st = self.stations[sid]
+            changed = False
+            try:
+                if self.hourly_out and fingerprint_pairs(pairs) != fingerprint_file(st["out"]):
+                    ensure_dirs(st["out"])
+                    write_csv(pairs, st["out"])
+                    changed = True
+                rows = csv_records(pairs)
+                path = ARCHIVE_PATTERN.format(station=sid)
+                if path == update_archive.ARCHIVE:
+                    changed = update_archive.archive_rows(rows, **self.derived) or changed
+                else:
+                    changed = update_archive.merge_rows(rows, path) or changed
+            except Exception as e:
+                self.results[sid] = e
+                continue
+            if self.cache is not None:
+                self.cache[st["url"]] = entry
+            self.results[sid] = len(pairs) if changed else None
+
+    # ---------- Orquestación ----------
+    async def run(self):
+        parse_q = asyncio.Queue(maxsize=self.queue)
+        write_q = asyncio.Queue(maxsize=self.queue)
+        sem = asyncio.Semaphore(self.concurrency)
+        with ThreadPoolExecutor(max_workers=self.concurrency) as io_pool, \
+                ProcessPoolExecutor(max_workers=self.workers, initializer=_init_parse_worker) as pool:
+            parsers = [asyncio.create_task(self.parse(pool, parse_q, write_q)) for _ in range(self.workers)]
+            writer = asyncio.create_task(self.write(write_q))
+            await asyncio.gather(*(self.fetch(sid, io_pool, sem, parse_q) for sid in self.stations))
+            for _ in parsers:
+                await parse_q.put(_DONE)
+            await asyncio.gather(*parsers)
+            await write_q.put(_DONE)
+            await writer
+        add_layouts(self.layouts)
+        return self.results
+
+
+# ---------- Main ----------
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Captura y archivado asíncronos de muchas estaciones AEMET")
+    ap.add_argument("--stations", default=STATIONS, help="JSON id -> {out, prov}")
+    ap.add_argument("--concurrency", type=int, default=CONCURRENCY, help="peticiones simultáneas")
+    ap.add_argument("--workers", type=int, default=None, help="procesos de parseo (por defecto, nº de CPUs)")
+    ap.add_argument("--queue", type=int, default=QUEUE, help="tamaño máximo de cada cola entre etapas")
+    ap.add_argument("--batch", type=int, default=BATCH, help="estaciones por lote de escritura")
+    ap.add_argument("--hourly-out", action="store_true", help="escribe también el CSV horario de cada estación")
+    ap.add_argument("--no-cache", action="store_true", help="ignora la caché HTTP condicional")
+    for flag in ("bin", "shards", "daily", "hdd"):
+        ap.add_argument(f"--{flag}", action="store_true", help=f"como update_archive.py --{flag}")
+    args = ap.parse_args(argv)
+    start_run()
+
+    stations = load_stations(args.stations)
+    cache = None if args.no_cache else load_http_cache()
+    derived = {k: getattr(args, k) for k in ("bin", "shards", "daily", "hdd")}
+    t0 = time.monotonic()
+    p = AsyncPipeline(stations, args.concurrency, args.workers, args.queue, args.batch, args.hourly_out, cache, derived)
+    results = asyncio.run(p.run())
+    if cache is not None:
+        save_http_cache(cache)
+
+    failed = changed = 0
+    for sid in sorted(results):
+        res = results[sid]
+        if isinstance(res, Exception):
+            failed += 1
+            print(f"ERROR: {sid}: {res}", file=sys.stderr)
+        elif res is not None:
+            changed += 1
+    print(f"INFO: {len(stations) - failed}/{len(stations)} estaciones ({changed} con datos nuevos) "
+          f"en {time.monotonic() - t0:.1f}s")
+    print(f"INFO: HTTP: {pool_report()}")
+    set_step_output("changed", "true" if changed else "false")
+    set_step_output("new_layouts", LAYOUT_STATS["new_signatures"])
+    if failed:
+        sys.exit(2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Relleno histórico desde AEMET OpenData (valores climatológicos diarios).
+
+OpenData no publica series horarias antiguas (solo las últimas 24h), así que
+el relleno trae por día tmin/tmax (con su hora UTC) y tmed, y los guarda en un
+fichero propio por estación (OUT_PATTERN, formato de archive_daily.py con count
+vacío). No se escribe en el fichero de agregados diarios porque archive_daily
+lo regenera solo desde el histórico horario (--full, build o si falta); el
+dashboard usa estos días donde aquel no tiene datos, así que los calculados a
+partir de observaciones horarias tienen prioridad.
+
+El rango se parte en trozos de CHUNK_DAYS días que se descargan en paralelo
+(estaciones x trozos) respetando un intervalo mínimo entre peticiones. Cada
+trozo terminado se guarda en STATE_DIR, así que relanzar el comando continúa
+donde se quedó.
+
+Uso:
+    AEMET_API_KEY=... python scripts/backfill_opendata.py --from 2025-01-01 --to 2025-10-26 [--station 9091R ...]
+                                                          [--deadline 3600]
+
+Para pruebas sin red ni clave, mock_aemet.py sirve los registros de
+scripts/fixtures/opendata_<estación>_diarios.json con el mismo doble salto
+{estado, datos}; con --opendata-quota corta tras N trozos (429) para probar
+la reanudación:
+
+    python scripts/mock_aemet.py --port 8800 --opendata-quota 2 &
+    python scripts/backfill_opendata.py --from 2025-01-01 --to 2025-03-31 \
+        --base-url http://127.0.0.1:8800/opendata --min-interval 0.1   # 2 trozos OK, 1 pendiente
+    # relanzar (con el servidor sin cuota) descarga solo el trozo pendiente
+"""
+import argparse, json, os, sys, threading, time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, datetime, timedelta, timezone
+
+import requests
+
+import archive_daily
+from fetch_aemet_9091R import HEADERS, STATION, _get, start_run
+
+# === Configuración ===
+BASE_URL = os.environ.get("AEMET_OPENDATA_URL", "https://opendata.aemet.es/opendata")
+DAILY_PATH = "/api/valores/climatologicos/diarios/datos/fechaini/{ini}/fechafin/{fin}/estacion/{station}"
+OUT_PATTERN = "docs/data/{station}_daily_opendata.csv"
+STATE_DIR = ".cache/backfill"
+CHUNK_DAYS = 30
+CONCURRENCY = 2
+MIN_INTERVAL = 1.5  # segundos entre peticiones (límite de OpenData ~40-50/min)
+
+
+class RateLimiter:
+    """Garantiza un intervalo mínimo entre peticiones, compartido entre hilos."""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._next = 0.0
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+# ---------- Trozos y estado ----------
+def chunks(start: date, end: date, days=CHUNK_DAYS):
+    """[(ini, fin)] consecutivos e inclusivos que cubren [start, end]."""
+    out = []
+    cur = start
+    while cur <= end:
+        fin = min(end, cur + timedelta(days=days - 1))
+        out.append((cur, fin))
+        cur = fin + timedelta(days=1)
+    return out
+
+def _state_path(station, ini, fin, state_dir=STATE_DIR):
+    return os.path.join(state_dir, station, f"{ini.isoformat()}_{fin.isoformat()}.json")
+
+def _save_chunk(path, records):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(records, f)
+    os.replace(tmp, path)
+
+
+# ---------- Descarga ----------
+def _get_json(session, url, limiter, api_key=None):
+    """
+    JSON de una URL de OpenData. Reintentos, Retry-After, circuito por host y
+    plazo (--deadline) son los de fetch_aemet_9091R._get.
+    """
+    headers = dict(HEADERS)
+    if api_key:
+        headers["api_key"] = api_key
+    limiter.wait()
+    r = _get(url, session=session, headers=headers)
+    r.raise_for_status()
+    # OpenData sirve los datos en ISO-8859-15 sin declararlo siempre
+    r.encoding = r.encoding or "latin-1"
+    return json.loads(r.text)
+
+def fetch_daily_chunk(session, limiter, station, ini, fin, base_url=BASE_URL, api_key=None):
+    """Lista de dicts climatológicos diarios de OpenData para [ini, fin]."""
+    url = base_url + DAILY_PATH.format(
+        ini=f"{ini.isoformat()}T00:00:00UTC", fin=f"{fin.isoformat()}T23:59:59UTC", station=station,
+    )
+    meta = _get_json(session, url, limiter, api_key)
+    estado = int(meta.get("estado", 200))
+    if estado == 404:  # "No hay datos que satisfagan esos criterios"
+        return []
+    if estado != 200 or "datos" not in meta:
+        raise RuntimeError(f"OpenData {station} {ini}..{fin}: {meta.get('descripcion', meta)}")
+    return _get_json(session, meta["datos"], limiter)
+
+
+# ---------- Conversión al formato de agregados diarios ----------
+def _num(s):
+    try:
+        return float(str(s).replace(",", "."))
+    except (TypeError, ValueError):
+        return None
+
+def _hora_utc(day, hhmm):
+    """'YYYY-MM-DD' + 'HH:MM' (UTC) -> ISO 'Z'; '' si la hora es 'Varias' o no parsea."""
+    try:
+        t = datetime.strptime(f"{day} {hhmm}", "%Y-%m-%d %H:%M").replace(tzinfo=timezone.utc)
+    except (TypeError, ValueError):
+        return ""
+    return t.isoformat().replace("+00:00", "Z")
+
+def to_daily_row(rec):
+    """Registro climatológico de OpenData -> fila de archive_daily (None si faltan tmin/tmax)."""
+    day = rec.get("fecha")
+    tmin, tmax = _num(rec.get("tmin")), _num(rec.get("tmax"))
+    if not day or tmin is None or tmax is None:
+        return None
+    tmed = _num(rec.get("tmed"))
+    return {
+        "date_local": day,
+        "min_c": f"{tmin:.1f}", "min_utc": _hora_utc(day, rec.get("horatmin")),
+        "max_c": f"{tmax:.1f}", "max_utc": _hora_utc(day, rec.get("horatmax")),
+        "mean_c": "" if tmed is None else f"{tmed:.2f}",
+        "count": "",
+    }
+
+def merge_into_daily(station, rows, overwrite=False, pattern=OUT_PATTERN):
+    """
+    Fusiona filas diarias en el fichero OpenData de la estación (por defecto sin
+    reemplazar días ya descargados). Devuelve nº de días añadidos/cambiados.
+    """
+    path = pattern.format(station=station)
+    by_day = {r["date_local"]: r for r in archive_daily._read(path)}
+    n = 0
+    for r in rows:
+        if overwrite or r["date_local"] not in by_day:
+            by_day[r["date_local"]] = r
+            n += 1
+    if n:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        archive_daily.write_daily(by_day, path)
+    return n
+
+
+# ---------- Orquestación ----------
+def backfill(stations, start, end, chunk_days=CHUNK_DAYS, concurrency=CONCURRENCY,
+             min_interval=MIN_INTERVAL, base_url=BASE_URL, api_key=None,
+             state_dir=STATE_DIR, overwrite=False, pattern=OUT_PATTERN):
+    """
+    Descarga (en paralelo y reanudable) y fusiona. Devuelve
+    { estación: (días_fusionados, trozos_fallidos) }.
+    """
+    limiter = RateLimiter(min_interval)
+    session = requests.Session()
+    jobs = [(s, ini, fin) for s in stations for ini, fin in chunks(start, end, chunk_days)]
+    pending = [j for j in jobs if not os.path.exists(_state_path(*j, state_dir=state_dir))]
+    print(f"INFO: {len(jobs)} trozos, {len(jobs) - len(pending)} ya descargados")
+
+    failed = {s: 0 for s in stations}
+    def run(job):
+        station, ini, fin = job
+        recs = fetch_daily_chunk(session, limiter, station, ini, fin, base_url, api_key)
+        _save_chunk(_state_path(station, ini, fin, state_dir), recs)
+        return len(recs)
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        futs = {pool.submit(run, j): j for j in pending}
+        for fut in as_completed(futs):
+            station, ini, fin = futs[fut]
+            try:
+                print(f"OK: {station} {ini}..{fin}: {fut.result()} días")
+            except Exception as e:
+                failed[station] += 1
+                print(f"ERROR: {station} {ini}..{fin}: {e}", file=sys.stderr)
+
+    results = {}
+    for station in stations:
+        rows = []
+        for ini, fin in chunks(start, end, chunk_days):
+            path = _state_path(station, ini, fin, state_dir)
+            if os.path.exists(path):
+                with open(path, encoding="utf-8") as f:
+                    rows.extend(r for r in map(to_daily_row, json.load(f)) if r is not None)
+        results[station] = (merge_into_daily(station, rows, overwrite, pattern), failed[station])
+    return results
+
+
+# ---------- Main ----------
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Relleno histórico desde AEMET OpenData")
+    ap.add_argument("--from", dest="start", required=True, type=date.fromisoformat)
+    ap.add_argument("--to", dest="end", required=True, type=date.fromisoformat)
+    ap.add_argument("--station", action="append", help=f"indicativo (repetible; por defecto {STATION})")
+    ap.add_argument("--chunk-days", type=int, default=CHUNK_DAYS)
+    ap.add_argument("--concurrency", type=int, default=CONCURRENCY)
+    ap.add_argument("--min-interval", type=float, default=MIN_INTERVAL, help="segundos entre peticiones")
+    ap.add_argument("--base-url", default=BASE_URL)
+    ap.add_argument("--state-dir", default=STATE_DIR)
+    ap.add_argument("--overwrite", action="store_true", help="reemplaza también días ya descargados")
+    ap.add_argument("--deadline", type=float, default=None,
+                    help="presupuesto total de red en segundos (por defecto, sin límite)")
+    args = ap.parse_args(argv)
+    start_run(args.deadline)
+
+    api_key = os.environ.get("AEMET_API_KEY")
+    if not api_key and args.base_url == BASE_URL:
+        print("ERROR: falta AEMET_API_KEY", file=sys.stderr)
+        sys.exit(2)
+
+    results = backfill(
+        args.station or [STATION], args.start, args.end, args.chunk_days, args.concurrency,
+        args.min_interval, args.base_url, api_key, args.state_dir, args.overwrite,
+    )
+    failed = 0
+    for station, (n, nfail) in sorted(results.items()):
+        failed += nfail
+        print(f"OK: {station}: {n} días fusionados en {OUT_PATTERN.format(station=station)}"
+              + (f" ({nfail} trozos pendientes, relanzar para reintentar)" if nfail else ""))
+    if failed:
+        sys.exit(2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Benchmark extremo a extremo del recolector contra mock_aemet.py:
+fetch_html -> parse_aemet_html_last24 -> write_csv -> update_archive.main
+para N estaciones sintéticas, en un directorio temporal.
+
+Informa páginas/s, filas/s, latencias p50/p99 por página y RSS máximo.
+
+Uso:
+    python scripts/bench_e2e.py [--stations 200] [--concurrency 8] [--rounds 2]
+                                [--latency-ms 150] [--error-rate 0.02] [--padding-kb 200]
+"""
+import argparse, contextlib, io, os, resource, sys, tempfile, time
+from concurrent.futures import ThreadPoolExecutor
+
+import fetch_aemet_9091R, update_archive
+from collect_stations import make_session
+from fetch_aemet_9091R import POOL_STATS, fetch_html, parse_aemet_html_last24, write_csv
+from mock_aemet import MockAemet
+
+
+def _pct(values, p):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+def run_page(session, url, workdir, sid):
+    """Una página completa; devuelve (segundos, filas)."""
+    t0 = time.perf_counter()
+    pairs = parse_aemet_html_last24(fetch_html(url, session=session))
+    hourly = os.path.join(workdir, f"{sid}_temp_hourly.csv")
+    write_csv(pairs, hourly)
+    update_archive.main(["--hourly", hourly, "--archive", os.path.join(workdir, f"{sid}_temp_history.csv")])
+    return time.perf_counter() - t0, len(pairs)
+
+def bench(n_stations=50, concurrency=8, rounds=1, **server_opts):
+    srv = MockAemet(("127.0.0.1", 0), **server_opts).start()
+    session = make_session(concurrency)
+    stations = [f"S{i:04d}" for i in range(n_stations)]
+    lat, rows, errors = [], 0, 0
+    with tempfile.TemporaryDirectory() as workdir, contextlib.redirect_stdout(io.StringIO()):
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+            for _ in range(rounds):
+                futs = [pool.submit(run_page, session, srv.url_for(s), workdir, s) for s in stations]
+                for fut in futs:
+                    try:
+                        dt, n = fut.result()
+                        lat.append(dt)
+                        rows += n
+                    except Exception:
+                        errors += 1
+        wall = time.perf_counter() - t0
+    srv.shutdown()
+    return {
+        "pages": len(lat), "errors": errors, "rows": rows, "wall_s": wall,
+        "pages_per_s": len(lat) / wall, "rows_per_s": rows / wall,
+        "p50_ms": _pct(lat, 50) * 1000, "p99_ms": _pct(lat, 99) * 1000,
+        "connections": POOL_STATS["connections"],
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Benchmark extremo a extremo contra AEMET simulado")
+    ap.add_argument("--stations", type=int, default=50)
+    ap.add_argument("--concurrency", type=int, default=8)
+    ap.add_argument("--rounds", type=int, default=1, help="pasadas sobre todas las estaciones")
+    ap.add_argument("--latency-ms", type=float, default=0.0)
+    ap.add_argument("--error-rate", type=float, default=0.0)
+    ap.add_argument("--rows", type=int, default=24)
+    ap.add_argument("--padding-kb", type=int, default=0)
+    ap.add_argument("--pages-dir")
+    args = ap.parse_args(argv)
+    fetch_aemet_9091R.LAYOUT_CACHE = None  # sin persistir: las páginas medidas no deben entrar en la caché real
+
+    r = bench(args.stations, args.concurrency, args.rounds, latency_ms=args.latency_ms,
+              error_rate=args.error_rate, rows=args.rows, padding_kb=args.padding_kb, pages_dir=args.pages_dir)
+    print(f"páginas: {r['pages']} ({r['errors']} errores)  filas: {r['rows']}  tiempo: {r['wall_s']:.2f}s  "
+          f"conexiones: {r['connections']}")
+    print(f"{r['pages_per_s']:.1f} páginas/s  {r['rows_per_s']:.0f} filas/s  "
+          f"p50 {r['p50_ms']:.1f} ms  p99 {r['p99_ms']:.1f} ms  RSS máx {r['peak_rss_mb']:.1f} MB")
+    if r["errors"] and not args.error_rate:
+        sys.exit(2)
+
+if __name__ == "__main__":
+    main()
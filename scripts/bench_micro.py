@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Microbenchmarks de los caminos calientes: parseo de la página, detección de
+cabeceras, conversión de temperaturas, escritura del CSV horario y merges del
+histórico (update_archive.main) sobre archivos sintéticos de distintos tamaños.
+
+Uso:
+    python scripts/bench_micro.py [paginas/*.html] [--sizes 1000,100000,1000000]
+                                  [--repeat 5] [--json bench/<commit>.json]
+                                  [--compare bench/base.json] [--tolerance 0.15]
+
+El merge --full no se mide por encima de 1M filas (un 10M tarda minutos por repetición).
+
+Sin páginas se mide una página sintética de mock_aemet. Con --json se guardan
+los resultados; con --compare se comparan contra unos anteriores y se sale con
+código 1 si algún caso es más lento que la tolerancia.
+"""
+import argparse, contextlib, io, json, os, platform, shutil, statistics, subprocess, sys, tempfile, time
+from datetime import datetime, timedelta, timezone
+
+import fetch_aemet_9091R, update_archive
+from bench_parsers import load_pages
+from fetch_aemet_9091R import (
+    _is_temp_header, _parse_float_celsius, format_csv_rows, parse_aemet_html_last24, write_csv,
+)
+from mock_aemet import HEADERS_ROW, synthetic_page
+
+SIZES = (1_000, 100_000, 1_000_000)
+T0 = datetime(2000, 1, 1, tzinfo=timezone.utc)
+
+
+def timeit(fn, repeat=5, setup=None, number=1):
+    """Tiempos (s) por llamada de `repeat` medidas; `setup` se ejecuta fuera del cronómetro."""
+    times = []
+    for _ in range(repeat):
+        if setup: setup()
+        t0 = time.perf_counter()
+        for _ in range(number):
+            fn()
+        times.append((time.perf_counter() - t0) / number)
+    return times
+
+def synthetic_pairs(n, start=T0, offset=0.0):
+    return [(start + timedelta(hours=i), round(-5 + (i * 7 % 300) / 10 + offset, 1)) for i in range(n)]
+
+def write_archive(path, n):
+    """Histórico sintético de n filas horarias consecutivas desde T0."""
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        f.write(",".join(update_archive.FIELDS) + "\r\n")
+        step = 100_000
+        for i in range(0, n, step):
+            pairs = synthetic_pairs(min(step, n - i), T0 + timedelta(hours=i))
+            f.write("".join(",".join(r) + "\r\n" for r in format_csv_rows(pairs)))
+
+
+# ---------- Casos ----------
+def cases_parse(pages):
+    for fn, html in pages:
+        name = os.path.basename(fn)
+        yield f"parse_last24[{name}]", lambda html=html: parse_aemet_html_last24(html), 5
+
+def cases_scalar():
+    headers = HEADERS_ROW + ["Temp. (°C)", "T. máx (ºC)", "Sensación térmica"]
+    values = ["12,3", "-0,4", "ND", "-", "", "\xa021,0 ", "abc"] * 20
+    yield "is_temp_header", lambda: [_is_temp_header(h) for h in headers], 2000
+    yield "parse_float_celsius", lambda: [_parse_float_celsius(v) for v in values], 2000
+
+def cases_write(workdir):
+    for n in (24, 8_760, 87_600):
+        pairs = synthetic_pairs(n)
+        out = os.path.join(workdir, "hourly_bench.csv")
+        yield f"write_csv[{n}]", lambda pairs=pairs, out=out: write_csv(pairs, out), max(1, 20_000 // n)
+
+def cases_merge(workdir, sizes):
+    """update_archive.main incremental y --full; el histórico se restaura antes de cada medida."""
+    for n in sizes:
+        pristine = os.path.join(workdir, f"archive_{n}.csv")
+        write_archive(pristine, n)
+        arch = os.path.join(workdir, "archive_work.csv")
+        hourly = os.path.join(workdir, f"hourly_{n}.csv")
+        # 24 h que solapan 23 filas de la cola con otros valores y añaden una nueva
+        write_csv(synthetic_pairs(24, T0 + timedelta(hours=n - 23), offset=0.5), hourly)
+        restore = lambda p=pristine, a=arch: shutil.copyfile(p, a)
+        for mode, extra in (("incremental", []), ("full", ["--full"])):
+            if mode == "full" and n > 1_000_000:
+                continue
+            argv = ["--hourly", hourly, "--archive", arch] + extra
+            yield f"merge_{mode}[{n}]", (lambda argv=argv: update_archive.main(argv)), 1, restore
+
+
+# ---------- Resultados ----------
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(results, baseline, tolerance):
+    """Imprime la comparación y devuelve la lista de casos que empeoran más de `tolerance`."""
+    worse = []
+    for name, r in results.items():
+        old = baseline.get("results", {}).get(name)
+        if not old:
+            continue
+        ratio = r["median_s"] / old["median_s"]
+        flag = ""
+        if ratio > 1 + tolerance:
+            worse.append(name); flag = "  <-- REGRESIÓN"
+        print(f"{name:32s} {old['median_s'] * 1e3:10.3f} -> {r['median_s'] * 1e3:10.3f} ms  x{ratio:5.2f}{flag}")
+    return worse
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Microbenchmarks de parseo, CSV y merge del histórico")
+    ap.add_argument("paths", nargs="*", help="páginas AEMET guardadas (.html o directorios)")
+    ap.add_argument("--sizes", default=",".join(map(str, SIZES)), help="filas de los históricos sintéticos")
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--only", help="mide sólo los casos cuyo nombre contiene este texto")
+    ap.add_argument("--json", help="guarda los resultados en este fichero")
+    ap.add_argument("--compare", help="resultados anteriores (JSON) con los que comparar")
+    ap.add_argument("--tolerance", type=float, default=0.15, help="empeoramiento relativo admitido con --compare")
+    args = ap.parse_args(argv)
+    fetch_aemet_9091R.LAYOUT_CACHE = None  # sin persistir: las páginas medidas no deben entrar en la caché real
+
+    pages = load_pages(args.paths) if args.paths else [("synthetic.html", synthetic_page("9091R", padding_kb=200))]
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        cases = [c + (None,) for c in (*cases_parse(pages), *cases_scalar(), *cases_write(workdir))]
+        for case in (*cases, *cases_merge(workdir, sizes)):
+            name, fn, number, setup = case
+            if args.only and args.only not in name:
+                continue
+            with contextlib.redirect_stdout(io.StringIO()):
+                fn() if setup is None else (setup(), fn())  # calentamiento
+                times = timeit(fn, args.repeat, setup, number)
+            results[name] = {"median_s": statistics.median(times), "min_s": min(times), "repeat": args.repeat, "number": number}
+            print(f"{name:32s} {results[name]['median_s'] * 1e3:10.3f} ms  (min {results[name]['min_s'] * 1e3:.3f})")
+
+    doc = {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": results,
+    }
+    if args.json:
+        os.makedirs(os.path.dirname(args.json) or ".", exist_ok=True)
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(doc, f, indent=2, sort_keys=True)
+        print(f"OK: resultados en {args.json}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            worse = compare(results, json.load(f), args.tolerance)
+        if worse:
+            print(f"ERROR: {len(worse)} casos más lentos que la referencia: {', '.join(worse)}", file=sys.stderr)
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Compara los backends de parse_aemet_html_last24 sobre páginas AEMET guardadas.
+
+Uso:
+    python scripts/bench_parsers.py paginas/*.html [--repeat 20] [--backends bs4,stream,lxml]
+
+Comprueba además que todos los backends devuelven exactamente lo mismo que 'bs4'.
+"""
+import argparse, glob, os, sys, time
+
+import fetch_aemet_9091R
+from fetch_aemet_9091R import BACKENDS, parse_aemet_html_last24
+
+
+def load_pages(paths):
+    files = []
+    for p in paths:
+        if os.path.isdir(p):
+            files.extend(sorted(glob.glob(os.path.join(p, "*.html"))))
+        else:
+            files.append(p)
+    pages = []
+    for fn in files:
+        with open(fn, encoding="utf-8", errors="replace") as f:
+            pages.append((fn, f.read()))
+    return pages
+
+def bench(pages, backend, repeat):
+    """Mejor tiempo (s) de `repeat` pasadas completas sobre todas las páginas."""
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for _, html in pages:
+            parse_aemet_html_last24(html, backend)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Benchmark de backends de parseo AEMET")
+    ap.add_argument("paths", nargs="+", help="ficheros .html o directorios que los contengan")
+    ap.add_argument("--repeat", type=int, default=20)
+    ap.add_argument("--backends", default=",".join(BACKENDS))
+    args = ap.parse_args(argv)
+    fetch_aemet_9091R.LAYOUT_CACHE = None  # sin persistir: las páginas medidas no deben entrar en la caché real
+
+    pages = load_pages(args.paths)
+    if not pages:
+        print("ERROR: no hay páginas que medir", file=sys.stderr)
+        sys.exit(2)
+
+    reference = {fn: parse_aemet_html_last24(html, "bs4") for fn, html in pages}
+    base = None
+    for name in args.backends.split(","):
+        try:
+            for fn, html in pages:
+                if parse_aemet_html_last24(html, name) != reference[fn]:
+                    raise RuntimeError(f"salida distinta de bs4 en {fn}")
+        except RuntimeError as e:
+            print(f"WARN: {name}: {e}")
+            continue
+        t = bench(pages, name, args.repeat)
+        base = base or t
+        per_page = t / len(pages) * 1000
+        print(f"{name:8s} {per_page:8.2f} ms/página  x{base / t:5.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Recolector multi-estación: descarga en paralelo las páginas 'ultimosdatos'
+de varias estaciones AEMET (pool acotado + Session compartida) y guarda
+un CSV horario por estación con el mismo formato que fetch_aemet_9091R.py.
+
+Uso:
+    python scripts/collect_stations.py [--stations scripts/stations.json] [--concurrency 4]
+"""
+import argparse, json, os, sys, time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from fetch_aemet_9091R import (
+    URL_TEMPLATE, PROV, ensure_dirs, fetch_html, fetch_html_conditional,
+    load_http_cache, parse_aemet_html_last24, pool_report, save_http_cache, start_run, write_csv,
+    make_session as _make_session,
+)
+
+# === Configuración ===
+STATIONS = "scripts/stations.json"
+CONCURRENCY = 4  # máximo de peticiones simultáneas a AEMET (ser educados)
+
+
+def load_stations(path):
+    """
+    Lee el listado de estaciones: { "<id>": { "out": "<csv>", "prov": "<k>" }, ... }
+    ('prov' es el parámetro k= de la URL; por defecto el de 9091R).
+    """
+    with open(path, encoding="utf-8") as f:
+        cfg = json.load(f)
+    return {
+        sid: {"out": st["out"], "url": URL_TEMPLATE.format(prov=st.get("prov", PROV), station=sid)}
+        for sid, st in cfg.items()
+    }
+
+def make_session(concurrency=CONCURRENCY):
+    return _make_session(pool_maxsize=concurrency)
+
+def collect_one(session, sid, st, cache=None):
+    """Nº de registros escritos, o None si la página no cambió desde la última captura."""
+    url = st["url"]
+    if cache is None:
+        html = fetch_html(url, session=session)
+    else:
+        prev = cache.get(url) if os.path.exists(st["out"]) else None
+        html, entry = fetch_html_conditional(url, session=session, entry=prev)
+        if html is None:
+            return None
+    pairs = parse_aemet_html_last24(html)
+    if not pairs:
+        raise RuntimeError("No se obtuvieron registros")
+    ensure_dirs(st["out"])
+    write_csv(pairs, st["out"])
+    if cache is not None:
+        cache[url] = entry
+    return len(pairs)
+
+def collect(stations, concurrency=CONCURRENCY, session=None, cache=None):
+    """
+    Descarga y procesa todas las estaciones con como mucho `concurrency`
+    peticiones en vuelo. Devuelve { id: nº registros | None (sin cambios) | Exception }.
+    `cache` (dict de load_http_cache) activa las peticiones condicionales.
+    """
+    session = session or make_session(concurrency)
+    results = {}
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        futs = {pool.submit(collect_one, session, sid, st, cache): sid for sid, st in stations.items()}
+        for fut in as_completed(futs):
+            sid = futs[fut]
+            try:
+                results[sid] = fut.result()
+            except Exception as e:
+                results[sid] = e
+    return results
+
+
+# ---------- Main ----------
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Captura concurrente de varias estaciones AEMET")
+    ap.add_argument("--stations", default=STATIONS, help="JSON id -> {out, prov}")
+    ap.add_argument("--concurrency", type=int, default=CONCURRENCY, help="peticiones simultáneas")
+    ap.add_argument("--no-cache", action="store_true", help="ignora la caché HTTP condicional")
+    args = ap.parse_args(argv)
+    start_run()
+
+    stations = load_stations(args.stations)
+    cache = None if args.no_cache else load_http_cache()
+    t0 = time.monotonic()
+    results = collect(stations, args.concurrency, cache=cache)
+    if cache is not None:
+        save_http_cache(cache)
+    failed = 0
+    for sid in sorted(results):
+        res = results[sid]
+        if isinstance(res, Exception):
+            failed += 1
+            print(f"ERROR: {sid}: {res}", file=sys.stderr)
+        elif res is None:
+            print(f"OK: {sid}: sin cambios")
+        else:
+            print(f"OK: {sid}: {res} registros. CSV -> {stations[sid]['out']}")
+    print(f"INFO: {len(stations) - failed}/{len(stations)} estaciones en {time.monotonic() - t0:.1f}s")
+    print(f"INFO: HTTP: {pool_report()}")
+    if failed:
+        sys.exit(2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Recolector residente: mantiene en memoria la Session HTTP, la caché de
+validadores y un índice de las últimas horas archivadas por estación, y
+programa las capturas de todas las estaciones con la cadencia indicada
+(con jitter, y backoff exponencial tras fallos). Las filas nuevas se
+acumulan y se vuelcan al histórico por lotes. Cada GAP_SCAN_EVERY busca
+huecos recuperables (últimas 24h, ver gaps.py) en el índice en memoria y
+re-captura enseguida, sin petición condicional, las estaciones que los
+tengan, en vez de esperar a su siguiente turno o al final del backoff.
+
+Uso:
+    python scripts/collector_daemon.py [--interval 3600] [--flush-every 3600] [--derived]
+    python scripts/collector_daemon.py --once      # una ronda + volcado (pruebas)
+"""
+import argparse, heapq, random, signal, sys, time
+from datetime import datetime, timedelta, timezone
+
+import update_archive
+from update_archive import ARCHIVE_PATTERN
+from collect_stations import CONCURRENCY, STATIONS, load_stations, make_session
+from fetch_aemet_9091R import (
+    STATION, csv_records, fetch_html_conditional, load_http_cache,
+    parse_aemet_html_last24, save_http_cache,
+)
+import gaps
+
+# === Configuración ===
+INTERVAL = 3600        # s entre capturas de una misma estación
+JITTER = 120           # ± s aleatorios para no golpear AEMET a la vez
+BACKOFF_BASE = 60      # s tras el primer fallo; se duplica en cada fallo seguido
+BACKOFF_MAX = 3 * 3600
+FLUSH_EVERY = 3600     # s máximos que una fila espera en memoria antes de archivarse
+FLUSH_ROWS = 500       # o volcado inmediato si se acumulan tantas filas
+INDEX_HOURS = 48       # ventana del índice en memoria (la página cubre 24h)
+GAP_SCAN_EVERY = 6 * 3600  # s entre búsquedas de huecos recuperables
+
+
+class Collector:
+    def __init__(self, stations, interval=INTERVAL, jitter=JITTER, flush_every=FLUSH_EVERY, derived=False):
+        self.stations = stations
+        self.interval = interval
+        self.jitter = jitter
+        self.flush_every = flush_every
+        self.derived = derived
+        self.session = make_session(CONCURRENCY)
+        self.cache = load_http_cache()
+        self.failures = {sid: 0 for sid in stations}
+        self.buffer = {sid: {} for sid in stations}   # datetime_utc -> fila pendiente
+        self.index = {sid: self._load_index(sid) for sid in stations}  # datetime_utc -> temp_c archivado
+        self.last_flush = time.monotonic()
+        self.next_gap_scan = time.monotonic() + GAP_SCAN_EVERY
+        self.stopping = False
+
+    def _load_index(self, sid):
+        since = datetime.now(timezone.utc) - timedelta(hours=INDEX_HOURS)
+        rows = update_archive.read_tail(since.strftime("%Y-%m-%dT%H:%M:%SZ"), ARCHIVE_PATTERN.format(station=sid))
+        return {r["datetime_utc"]: r["temp_c"] for r in rows}
+
+    def _next_delay(self, sid):
+        n = self.failures[sid]
+        base = self.interval if n == 0 else min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (n - 1))
+        return max(1.0, base + random.uniform(-self.jitter, self.jitter))
+
+    # ---------- Captura ----------
+    def capture(self, sid, force=False):
+        """
+        Una petición para la estación; devuelve nº de filas nuevas o cambiadas.
+        Con `force` no se envían validadores, así que la página siempre se parsea.
+        """
+        url = self.stations[sid]["url"]
+        html, entry = fetch_html_conditional(url, session=self.session, entry=None if force else self.cache.get(url))
+        if html is None:
+            return 0
+        pairs = parse_aemet_html_last24(html)
+        known, pending = self.index[sid], self.buffer[sid]
+        n = 0
+        for r in csv_records(pairs):
+            key = r["datetime_utc"]
+            if known.get(key) != r["temp_c"] and pending.get(key, {}).get("temp_c") != r["temp_c"]:
+                pending[key] = r
+                n += 1
+        self.cache[url] = entry
+        return n
+
+    # ---------- Volcado por lotes ----------
+    def flush(self):
+        for sid, pending in self.buffer.items():
+            if not pending:
+                continue
+            rows = [pending[k] for k in sorted(pending)]
+            path = ARCHIVE_PATTERN.format(station=sid)
+            if self.derived and sid == STATION and path == update_archive.ARCHIVE:
+                update_archive.archive_rows(rows, shards=True, daily=True, hdd=True)
+            elif update_archive.merge_incremental(rows, path) is None:
+                update_archive.merge_full(rows, path)
+            self.index[sid].update((r["datetime_utc"], r["temp_c"]) for r in rows)
+            pending.clear()
+            print(f"OK: {sid}: {len(rows)} filas volcadas a {path}")
+        limit = (datetime.now(timezone.utc) - timedelta(hours=INDEX_HOURS)).strftime("%Y-%m-%dT%H:%M:%SZ")
+        for known in self.index.values():
+            for k in [k for k in known if k < limit]:
+                del known[k]
+        save_http_cache(self.cache)
+        self.last_flush = time.monotonic()
+
+    # ---------- Huecos recuperables ----------
+    def recoverable_gaps(self, sid, now=None):
+        """Intervalos [(inicio, fin)] sin fila, archivada o pendiente, que la página de 24h aún cubre."""
+        now = now or datetime.now(timezone.utc)
+        until = now.replace(minute=0, second=0, microsecond=0) - timedelta(hours=gaps.PUBLISH_DELAY_HOURS)
+        keys = sorted(set(self.index[sid]) | set(self.buffer[sid]))
+        rec, _ = gaps.split_recoverable(gaps.find_gaps(keys, until), now)
+        return rec
+
+    def refill_gaps(self):
+        for sid in self.stations:
+            rec = self.recoverable_gaps(sid)
+            if not rec:
+                continue
+            print(f"INFO: {sid}: {gaps.n_hours(rec)} h de huecos recuperables, re-captura")
+            try:
+                n = self.capture(sid, force=True)
+                print(f"INFO: {sid}: {n} filas nuevas")
+            except Exception as e:
+                print(f"ERROR: {sid} (re-captura de huecos): {e}", file=sys.stderr)
+        self.next_gap_scan = time.monotonic() + GAP_SCAN_EVERY
+
+    def _flush_due(self):
+        pending = sum(len(b) for b in self.buffer.values())
+        return pending >= FLUSH_ROWS or (pending and time.monotonic() - self.last_flush >= self.flush_every)
+
+    # ---------- Bucle ----------
+    def run(self, once=False):
+        now = time.monotonic()
+        # primera ronda repartida a lo largo del jitter
+        queue = [(now + random.uniform(0, self.jitter if not once else 0), sid) for sid in self.stations]
+        heapq.heapify(queue)
+        done = set()
+        while queue and not self.stopping:
+            due, sid = heapq.heappop(queue)
+            wait = due - time.monotonic()
+            if wait > 0:
+                time.sleep(min(wait, 5.0))
+                heapq.heappush(queue, (due, sid))
+                if time.monotonic() >= self.next_gap_scan:
+                    self.refill_gaps()
+                if self._flush_due():
+                    self.flush()
+                continue
+            try:
+                n = self.capture(sid)
+                self.failures[sid] = 0
+                print(f"INFO: {sid}: {n} filas nuevas")
+            except Exception as e:
+                self.failures[sid] += 1
+                print(f"ERROR: {sid} (fallo {self.failures[sid]}): {e}", file=sys.stderr)
+            if once:
+                done.add(sid)
+                if len(done) == len(self.stations):
+                    break
+                continue
+            heapq.heappush(queue, (time.monotonic() + self._next_delay(sid), sid))
+            if self._flush_due():
+                self.flush()
+        self.flush()
+
+    def stop(self, *_):
+        self.stopping = True
+
+
+# ---------- Main ----------
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Recolector residente AEMET")
+    ap.add_argument("--stations", default=STATIONS)
+    ap.add_argument("--interval", type=float, default=INTERVAL, help="s entre capturas por estación")
+    ap.add_argument("--jitter", type=float, default=JITTER)
+    ap.add_argument("--flush-every", type=float, default=FLUSH_EVERY, help="s máximos entre volcados")
+    ap.add_argument("--derived", action="store_true",
+                    help=f"para {STATION}, mantiene también shards, agregados diarios y grados-día")
+    ap.add_argument("--once", action="store_true", help="una sola ronda y volcado")
+    args = ap.parse_args(argv)
+
+    c = Collector(load_stations(args.stations), args.interval, args.jitter, args.flush_every, args.derived)
+    signal.signal(signal.SIGTERM, c.stop)
+    signal.signal(signal.SIGINT, c.stop)
+    c.run(once=args.once)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Grados-hora y grados-día de calefacción (HDH/HDD) sobre el histórico horario.
+
+Por cada hora observada: HDH_b = max(0, b - T). Por día local (Europe/Madrid):
+HDD_b = suma(HDH_b) / horas observadas, es decir, el déficit medio de las horas
+que hay. Equivale a suma/24 con el día completo y cuenta como un día los de 23
+o 25 horas del cambio de hora. Solo se extrapola así con al menos MIN_HOURS
+horas: por debajo (primer y último día del histórico, capturas perdidas) el
+HDD queda vacío, porque una o dos horas no representan el día. hdh_b sigue
+siendo la suma de lo observado, sin escalar, y la columna hours muestra la
+cobertura. Los totales semanales (ISO), mensuales y por temporada de
+calefacción (1-oct a 30-sep, p.ej. '2025-26') suman solo los días con HDD;
+sus hours y hdh_b también excluyen los días incompletos.
+
+Ficheros (uno por periodo): docs/data/9091R_hdd_{day,week,month,season}.csv
+con columnas <periodo>,hours,hdh_<b>,hdd_<b> para cada base b.
+
+Uso:
+    python scripts/degree_days.py build [--base 15 --base 18]
+"""
+import argparse, csv, os
+from datetime import date
+
+ARCHIVE = "docs/data/9091R_temp_history.csv"
+OUT_PATTERN = "docs/data/9091R_hdd_{period}.csv"
+BASES = (15.0, 18.0)
+SEASON_START_MONTH = 10
+MIN_HOURS = 18  # horas observadas mínimas para dar HDD de un día
+PERIODS = ("day", "week", "month", "season")
+
+
+def _b(base) -> str:
+    return f"{base:g}"
+
+def fields(period, bases=BASES):
+    cols = [period, "hours"]
+    for b in bases:
+        cols += [f"hdh_{_b(b)}", f"hdd_{_b(b)}"]
+    return cols
+
+def period_key(day: str, period: str) -> str:
+    if period == "day":
+        return day
+    d = date.fromisoformat(day)
+    if period == "week":
+        y, w, _ = d.isocalendar()
+        return f"{y}-W{w:02d}"
+    if period == "month":
+        return day[:7]
+    start = d.year if d.month >= SEASON_START_MONTH else d.year - 1
+    return f"{start}-{(start + 1) % 100:02d}"
+
+
+# ---------- Cálculo ----------
+def daily_degree_hours(rows, bases=BASES, days=None):
+    """
+    rows: filas del histórico (dicts con date_local, temp_c). Una sola pasada;
+    devuelve { date_local: [horas, hdh_b1, hdh_b2, ...] } para `days` (o todos).
+    """
+    acc = {}
+    for r in rows:
+        day = r["date_local"]
+        if days is not None and day not in days:
+            continue
+        t = float(r["temp_c"])
+        a = acc.get(day)
+        if a is None:
+            acc[day] = a = [0] + [0.0] * len(bases)
+        a[0] += 1
+        for i, b in enumerate(bases, 1):
+            if t < b:
+                a[i] += b - t
+    return acc
+
+def _with_hdd(vals):
+    """
+    [horas, hdh...] -> [horas, hdh..., hdd...] con el HDD escalado a la
+    cobertura del día, o None en cada hdd si hay menos de MIN_HOURS horas.
+    """
+    hours = vals[0]
+    if hours < MIN_HOURS:
+        return list(vals) + [None] * (len(vals) - 1)
+    return list(vals) + [h / hours for h in vals[1:]]
+
+def _rollup(daily, period):
+    out = {}
+    for day, vals in daily.items():
+        if vals[0] < MIN_HOURS:
+            continue
+        vals = _with_hdd(vals)
+        key = period_key(day, period)
+        a = out.get(key)
+        if a is None:
+            out[key] = list(vals)
+        else:
+            for i, v in enumerate(vals):
+                a[i] += v
+    return out
+
+def _to_row(key, vals, period, bases):
+    """vals: [horas, hdh..., hdd...] (ver _with_hdd); hdd None -> celda vacía."""
+    row = {period: key, "hours": int(vals[0])}
+    for i, b in enumerate(bases, 1):
+        hdd = vals[i + len(bases)]
+        row[f"hdh_{_b(b)}"] = f"{vals[i]:.1f}"
+        row[f"hdd_{_b(b)}"] = "" if hdd is None else f"{hdd:.2f}"
+    return row
+
+
+# ---------- Ficheros ----------
+def _path(period, pattern=OUT_PATTERN):
+    return pattern.format(period=period)
+
+def read_daily(bases=BASES, pattern=OUT_PATTERN):
+    """{ día: [horas, hdh...] } desde el fichero diario, o None si falta o cambió la base."""
+    path = _path("day", pattern)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        r = csv.DictReader(f)
+        if r.fieldnames != fields("day", bases):
+            return None
+        return {
+            row["day"]: [int(row["hours"])] + [float(row[f"hdh_{_b(b)}"]) for b in bases]
+            for row in r
+        }
+
+def write_all(daily, bases=BASES, pattern=OUT_PATTERN):
+    """Escribe el fichero diario y los derivados (semana, mes, temporada)."""
+    for period in PERIODS:
+        agg = {d: _with_hdd(v) for d, v in daily.items()} if period == "day" else _rollup(daily, period)
+        with open(_path(period, pattern), "w", encoding="utf-8", newline="") as f:
+            w = csv.DictWriter(f, fieldnames=fields(period, bases))
+            w.writeheader()
+            w.writerows(_to_row(k, agg[k], period, bases) for k in sorted(agg))
+
+def merge(rows, days, bases=BASES, pattern=OUT_PATTERN):
+    """
+    Recalcula solo `days` a partir de `rows` (todas las observaciones de esos
+    días) y regenera los derivados. None si no hay fichero diario aún.
+    """
+    daily = read_daily(bases, pattern)
+    if daily is None:
+        return None
+    daily.update(daily_degree_hours(rows, bases, set(days)))
+    write_all(daily, bases, pattern)
+    return sorted(days)
+
+def build_from_csv(csv_path=ARCHIVE, bases=BASES, pattern=OUT_PATTERN):
+    with open(csv_path, encoding="utf-8") as f:
+        daily = daily_degree_hours(csv.DictReader(f), bases)
+    write_all(daily, bases, pattern)
+    return daily
+
+
+# ---------- Main ----------
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Grados-hora / grados-día de calefacción")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    b = sub.add_parser("build", help="recalcula todo desde el CSV histórico")
+    b.add_argument("--csv", default=ARCHIVE)
+    b.add_argument("--base", type=float, action="append", help="temperatura base (ºC); repetible")
+    args = ap.parse_args(argv)
+
+    bases = tuple(args.base or BASES)
+    daily = build_from_csv(args.csv, bases)
+    print(f"OK: {len(daily)} días, bases {', '.join(_b(x) for x in bases)} ºC -> {OUT_PATTERN.format(period='*')}")
+
+if __name__ == "__main__":
+    main()
@@ -1,28 +1,247 @@
 #!/usr/bin/env python3
-import csv, os, sys, re
+import argparse, codecs, csv, hashlib, io, json, os, random, sys, re, threading, time
 from datetime import datetime, timezone
+from functools import lru_cache
+from html.parser import HTMLParser
+from urllib.parse import urlsplit
 from zoneinfo import ZoneInfo
 
 import requests
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
 from bs4 import BeautifulSoup
 
 # === Configuración ===
-URL = "https://www.aemet.es/es/eltiempo/observacion/ultimosdatos?k=pva&l=9091R&w=0&datos=det&x=&f=temperatura"
+URL_TEMPLATE = "https://www.aemet.es/es/eltiempo/observacion/ultimosdatos?k={prov}&l={station}&w=0&datos=det&x=&f=temperatura"
+STATION = "9091R"
+PROV = "pva"
+URL = URL_TEMPLATE.format(prov=PROV, station=STATION)
 OUT = "docs/data/9091R_temp_hourly.csv"
 TZ_LOCAL = ZoneInfo("Europe/Madrid")
 HEADERS = {"User-Agent": "Mozilla/5.0 (compatible; CYMAP-collector)"}
-TIMEOUT = 30
+CONNECT_TIMEOUT = 5
+READ_TIMEOUT = 30
+TIMEOUT = (CONNECT_TIMEOUT, READ_TIMEOUT)
+RETRIES = 4                 # reintentos tras el primer intento (5xx, 429, timeouts, conexión)
+BACKOFF_BASE = 1.0          # s; espera = U(0, min(BACKOFF_MAX, BACKOFF_BASE * 2**intento))
+BACKOFF_MAX = 20.0
+RUN_DEADLINE = float(os.environ.get("AEMET_DEADLINE", 240))  # presupuesto total de red por ejecución (s)
+BREAKER_THRESHOLD = 5       # llamadas seguidas que agotan sus reintentos contra un host y abren su circuito
+BREAKER_COOLDOWN = 60.0     # s con el circuito abierto antes de dejar pasar una prueba
+POOL_MAXSIZE = 8            # conexiones keep-alive por host en la sesión compartida
+FIELDS = ["date_local", "time_local", "datetime_utc", "temp_c", "source"]
+HTTP_CACHE = ".cache/aemet_http.json"  # validadores HTTP por URL (ETag/Last-Modified + hash)
 
 
 # ---------- Utilidades ----------
-def ensure_dirs():
-    os.makedirs(os.path.dirname(OUT), exist_ok=True)
+def ensure_dirs(out=OUT):
+    os.makedirs(os.path.dirname(out), exist_ok=True)
 
-def fetch_html():
-    r = requests.get(URL, timeout=TIMEOUT, headers=HEADERS)
+# ---------- Sesión compartida con pool de conexiones ----------
+POOL_STATS = {"requests": 0, "connections": 0, "by_host": {}}  # conexiones TCP(+TLS) abiertas por host
+_STATS_LOCK = threading.Lock()
+
+def _count_new_conn(host):
+    with _STATS_LOCK:
+        POOL_STATS["connections"] += 1
+        POOL_STATS["by_host"][host] = POOL_STATS["by_host"].get(host, 0) + 1
+
+class _CountingHTTPConnectionPool(HTTPConnectionPool):
+    def _new_conn(self):
+        _count_new_conn(self.host)
+        return super()._new_conn()
+
+class _CountingHTTPSConnectionPool(HTTPSConnectionPool):
+    def _new_conn(self):
+        _count_new_conn(self.host)
+        return super()._new_conn()
+
+class PooledAdapter(requests.adapters.HTTPAdapter):
+    """HTTPAdapter que cuenta cada conexión nueva en POOL_STATS."""
+    def init_poolmanager(self, *args, **kw):
+        super().init_poolmanager(*args, **kw)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _CountingHTTPConnectionPool, "https": _CountingHTTPSConnectionPool,
+        }
+
+def make_session(pool_maxsize=POOL_MAXSIZE):
+    """Sesión keep-alive con hasta `pool_maxsize` conexiones reutilizables por host."""
+    s = requests.Session()
+    s.headers.update(HEADERS)
+    adapter = PooledAdapter(pool_connections=4, pool_maxsize=pool_maxsize)
+    s.mount("https://", adapter)
+    s.mount("http://", adapter)
+    return s
+
+_SESSION = None
+_SESSION_LOCK = threading.Lock()
+
+def shared_session():
+    """Sesión del proceso, usada por todas las peticiones que no traen la suya."""
+    global _SESSION
+    with _SESSION_LOCK:
+        if _SESSION is None:
+            _SESSION = make_session()
+        return _SESSION
+
+def pool_report() -> str:
+    n, c = POOL_STATS["requests"], POOL_STATS["connections"]
+    hosts = ", ".join(f"{h}={k}" for h, k in sorted(POOL_STATS["by_host"].items()))
+    reuse = 1 - c / n if n else 0.0
+    return f"{n} peticiones, {c} conexiones nuevas ({hosts or '-'}); reutilización {reuse:.0%}"
+
+
+# ---------- Reintentos, circuito por host y plazo global ----------
+class CircuitOpen(RuntimeError):
+    pass
+
+class DeadlineExceeded(RuntimeError):
+    pass
+
+class CircuitBreaker:
+    """Abre tras `threshold` fallos seguidos; pasado `cooldown` deja pasar una petición de prueba."""
+    def __init__(self, threshold=BREAKER_THRESHOLD, cooldown=BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    def before(self, host):
+        with self._lock:
+            if self.opened_at is None:
+                return
+            left = self.opened_at + self.cooldown - time.monotonic()
+            if left > 0:
+                raise CircuitOpen(f"circuito abierto para {host} ({left:.0f}s restantes)")
+            self.opened_at = time.monotonic()  # semiabierto: una prueba por cooldown
+
+    def success(self):
+        with self._lock:
+            self.failures, self.opened_at = 0, None
+
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+
+_BREAKERS = {}
+_BREAKERS_LOCK = threading.Lock()
+_deadline = None  # time.monotonic() límite de la ejecución en curso; None = sin límite
+
+def breaker_for(url):
+    host = urlsplit(url).netloc
+    with _BREAKERS_LOCK:
+        return _BREAKERS.setdefault(host, CircuitBreaker())
+
+def start_run(budget=RUN_DEADLINE):
+    """Fija el plazo total de red de esta ejecución (None o <= 0 lo desactiva)."""
+    global _deadline
+    _deadline = time.monotonic() + budget if budget and budget > 0 else None
+
+def _time_left():
+    return None if _deadline is None else _deadline - time.monotonic()
+
+def _retry_after(r):
+    try:
+        return float(r.headers.get("Retry-After", ""))
+    except ValueError:
+        return None
+
+def _get(url, session=None, headers=HEADERS, **kw):
+    """
+    GET con timeouts separados de conexión/lectura, reintentos con backoff
+    exponencial y jitter ante 5xx/429/timeouts/errores de conexión, circuito
+    por host y sin pasarse del plazo de start_run(). Los 4xx no se reintentan.
+    Al circuito solo le cuenta un fallo por llamada, cuando se agotan los
+    reintentos, y nunca por 429: eso es cuota (ya se respeta Retry-After), no
+    un host caído, y no debe cortar al resto de estaciones.
+    """
+    get = (session if session is not None else shared_session()).get
+    host = urlsplit(url).netloc
+    breaker = breaker_for(url)
+    for attempt in range(RETRIES + 1):
+        breaker.before(host)
+        left = _time_left()
+        if left is not None and left <= 0:
+            raise DeadlineExceeded(f"plazo de red agotado antes de pedir {url}")
+        timeout = TIMEOUT if left is None else (min(CONNECT_TIMEOUT, left), min(READ_TIMEOUT, left))
+        wait, throttled = None, False
+        with _STATS_LOCK:
+            POOL_STATS["requests"] += 1
+        try:
+            r = get(url, timeout=timeout, headers=headers, **kw)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            err = e
+        else:
+            if r.status_code < 500 and r.status_code != 429:
+                breaker.success()
+                return r
+            err = requests.HTTPError(f"{r.status_code} {r.reason} para {url}", response=r)
+            throttled = r.status_code == 429
+            wait = _retry_after(r)
+            wait = None if wait is None else min(wait, BACKOFF_MAX)
+            r.close()
+        if attempt == RETRIES:
+            if not throttled:
+                breaker.failure()
+            raise err
+        if wait is None:
+            wait = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+        left = _time_left()
+        if left is not None and wait >= left:
+            raise DeadlineExceeded(f"plazo de red agotado tras {attempt + 1} intentos: {err}") from err
+        print(f"WARN: {err}; reintento {attempt + 1}/{RETRIES} en {wait:.1f}s", file=sys.stderr)
+        time.sleep(wait)
+
+def fetch_html(url=URL, session=None):
+    r = _get(url, session)
     r.raise_for_status()
     return r.text
 
+# ---------- Caché HTTP condicional ----------
+def load_http_cache(path=HTTP_CACHE):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_http_cache(cache, path=HTTP_CACHE):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(cache, f, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+
+def fetch_html_conditional(url=URL, session=None, entry=None):
+    """
+    GET con If-None-Match/If-Modified-Since a partir de `entry` (entrada previa
+    de la caché para esa URL). Devuelve (html, nueva_entrada); html es None si
+    el servidor responde 304 o el cuerpo tiene el mismo hash que la vez anterior.
+    La entrada solo debe guardarse en la caché cuando el resultado se haya procesado.
+    """
+    entry = entry or {}
+    headers = dict(HEADERS)
+    if entry.get("etag"):
+        headers["If-None-Match"] = entry["etag"]
+    if entry.get("last_modified"):
+        headers["If-Modified-Since"] = entry["last_modified"]
+
+    r = _get(url, session, headers)
+    if r.status_code == 304:
+        return None, entry
+    r.raise_for_status()
+
+    new = {
+        "etag": r.headers.get("ETag"),
+        "last_modified": r.headers.get("Last-Modified"),
+        "sha256": hashlib.sha256(r.content).hexdigest(),
+    }
+    if entry.get("sha256") == new["sha256"]:
+        return None, new
+    return r.text, new
+
 def _clean_text(s: str) -> str:
     return (s or "").strip().replace("\xa0", " ")
 
@@ -36,6 +255,15 @@ def _parse_float_celsius(s: str):
     except ValueError:
         return None
 
+_PUNCT_RE = re.compile(r"[\.\(\)\[\],%/-]+")  # puntuación común en cabeceras
+_SPACES_RE = re.compile(r"\s+")
+_C_UNIT_RE = re.compile(r"\bc\b")
+
+def _norm_header(h: str) -> str:
+    norm = _clean_text(h).lower().replace("º", "°")
+    norm = _PUNCT_RE.sub(" ", norm)
+    return _SPACES_RE.sub(" ", norm).strip()
+
 def _is_temp_header(h: str) -> bool:
     """
     Detecta cabeceras tipo:
@@ -45,17 +273,21 @@ def _is_temp_header(h: str) -> bool:
     """
     raw = _clean_text(h).lower()
     # Normalizamos símbolos y puntuación para ser tolerantes
-    norm = raw.replace("º", "°")
-    norm = re.sub(r"[\.\(\)\[\],%/-]+", " ", norm)  # quita puntuación común
-    norm = re.sub(r"\s+", " ", norm).strip()
+    norm = _norm_header(h)
     # Reglas: contiene 'temp' o 'temperatura' Y hace referencia a 'c' o '°c'
     has_temp_word = ("temp" in norm) or ("temperatura" in norm)
-    has_c_unit = ("°c" in raw) or ("ºc" in raw) or re.search(r"\bc\b", norm) is not None
+    has_c_unit = ("°c" in raw) or ("ºc" in raw) or _C_UNIT_RE.search(norm) is not None
     return has_temp_word and has_c_unit
 
 
-# ---------- Parser robusto por cabeceras ----------
-def parse_aemet_html_last24(html: str):
+# ---------- Extracción de la tabla (backends intercambiables) ----------
+# Todos devuelven (headers, rows): textos crudos de las <th> de THEAD y, por
+# cada <tr> del primer TBODY (o de la tabla si no hay), la lista de textos de
+# sus <td>. Se selecciona con PARSER / $AEMET_PARSER o el argumento backend=.
+PARSER = os.environ.get("AEMET_PARSER", "bs4")
+STREAM_CHUNK = 16 * 1024
+
+def _extract_table_bs4(html: str):
     soup = BeautifulSoup(html, "html.parser")
 
     table = soup.select_one("table.tabla_datos, table#table, table")
@@ -66,7 +298,160 @@ def parse_aemet_html_last24(html: str):
     if not thead:
         raise RuntimeError("La tabla no contiene THEAD con cabeceras")
 
-    headers = [_clean_text(th.get_text()) for th in thead.select("th")]
+    headers = [th.get_text() for th in thead.select("th")]
+    tbody = table.find("tbody") or table
+    rows = [[td.get_text() for td in tr.find_all("td")] for tr in tbody.find_all("tr")]
+    return headers, rows
+
+def _extract_table_lxml(html: str):
+    try:
+        import lxml.html
+    except ImportError:
+        raise RuntimeError("Backend 'lxml' no disponible (pip install lxml)")
+
+    doc = lxml.html.fromstring(html)
+    # select_one("table.tabla_datos, table#table, table") devuelve la primera
+    # <table> del documento, así que replicamos exactamente eso
+    tables = doc.xpath("(//table)[1]")
+    if not tables:
+        raise RuntimeError("No se encontró la tabla de datos en el HTML de AEMET")
+    table = tables[0]
+
+    thead = table.find(".//thead")
+    if thead is None:
+        raise RuntimeError("La tabla no contiene THEAD con cabeceras")
+
+    headers = [th.text_content() for th in thead.iter("th")]
+    tbody = table.find(".//tbody")
+    if tbody is None:
+        tbody = table
+    rows = [[td.text_content() for td in tr.iter("td")] for tr in tbody.iter("tr")]
+    return headers, rows
+
+
+class _TablaDatosParser(HTMLParser):
+    """
+    Parser en streaming (stdlib) que ignora todo el documento salvo la primera
+    <table>: sólo materializa los textos de sus <th> (THEAD) y <td>, y marca
+    `done` al cerrarse la tabla. `on_row(cells)` se llama al cerrar cada <tr>.
+    Con HTML bien formado coincide con bs4; si faltan </td> o </tr> los cierra
+    implícitamente en lugar de anidarlos como hace html.parser vía bs4.
+    """
+
+    def __init__(self, on_row=None):
+        super().__init__(convert_charrefs=True)
+        self.on_row = on_row
+        self.headers = []
+        self.rows = []          # (dentro_de_tbody, celdas)
+        self.found_table = False
+        self.found_thead = False
+        self.seen_tbody = False
+        self.done = False
+        self._depth = 0         # anidamiento de <table>
+        self._in_thead = False
+        self._tbody = 0         # 0 antes, 1 dentro del primer TBODY, 2 después
+        self._row = None
+        self._row_in_tbody = False
+        self._cell = None
+        self._cell_is_th = False
+
+    def _close_cell(self):
+        if self._cell is None:
+            return
+        text = "".join(self._cell)
+        if self._cell_is_th:
+            if self._in_thead:
+                self.headers.append(text)
+        elif self._row is not None:
+            self._row.append(text)
+        self._cell = None
+
+    def _close_row(self):
+        self._close_cell()
+        if self._row is None:
+            return
+        self.rows.append((self._row_in_tbody, self._row))
+        if self.on_row is not None:
+            self.on_row(self._row)
+        self._row = None
+
+    def handle_starttag(self, tag, attrs):
+        if self.done:
+            return
+        if tag == "table":
+            self._depth += 1
+            self.found_table = True
+            return
+        if self._depth == 0:
+            return
+        if tag == "thead" and not self.found_thead:
+            self.found_thead = self._in_thead = True
+        elif tag == "tbody" and self._tbody == 0:
+            self.seen_tbody = True
+            self._tbody = 1
+        elif tag == "tr":
+            self._close_row()
+            self._row = []
+            self._row_in_tbody = self._tbody == 1
+        elif tag in ("td", "th"):
+            self._close_cell()
+            self._cell = []
+            self._cell_is_th = tag == "th"
+
+    def handle_endtag(self, tag):
+        if self.done or self._depth == 0:
+            return
+        if tag in ("td", "th"):
+            self._close_cell()
+        elif tag == "tr":
+            self._close_row()
+        elif tag == "thead":
+            self._close_row()
+            self._in_thead = False
+        elif tag == "tbody" and self._tbody == 1:
+            self._close_row()
+            self._tbody = 2
+        elif tag == "table":
+            self._depth -= 1
+            if self._depth == 0:
+                self._close_row()
+                self.done = True
+
+    def handle_data(self, data):
+        if self._cell is not None and not self.done:
+            self._cell.append(data)
+
+    def table(self):
+        """(headers, rows) con la misma semántica que _extract_table_bs4."""
+        if not self.found_table:
+            raise RuntimeError("No se encontró la tabla de datos en el HTML de AEMET")
+        if not self.found_thead:
+            raise RuntimeError("La tabla no contiene THEAD con cabeceras")
+        rows = [cells for in_tbody, cells in self.rows if in_tbody or not self.seen_tbody]
+        return self.headers, rows
+
+def _extract_table_stream(html: str, chunk=STREAM_CHUNK):
+    p = _TablaDatosParser()
+    # alimentamos por trozos para dejar de tokenizar en cuanto cierra la tabla
+    for i in range(0, len(html), chunk):
+        p.feed(html[i:i + chunk])
+        if p.done:
+            break
+    if not p.done:
+        p.close()
+        p._close_row()
+    return p.table()
+
+BACKENDS = {
+    "bs4": _extract_table_bs4,
+    "lxml": _extract_table_lxml,
+    "stream": _extract_table_stream,
+}
+
+
+# ---------- Parser robusto por cabeceras ----------
+def _resolve_columns(headers):
+    """Índices (idx_fecha, idx_temp) a partir de las cabeceras ya limpias."""
     if not headers:
         raise RuntimeError("No se pudieron leer cabeceras de la tabla")
 
@@ -84,34 +469,85 @@ def parse_aemet_html_last24(html: str):
         raise RuntimeError(f"No encontré la columna de fecha/hora. Cabeceras: {headers}")
     if idx_temp < 0:
         raise RuntimeError(f"No encontré la columna de temperatura. Cabeceras: {headers}")
+    return idx_fecha, idx_temp
 
-    out = []
-    tbody = table.find("tbody") or table
-    for tr in tbody.find_all("tr"):
-        tds = tr.find_all("td")
-        if len(tds) <= max(idx_fecha, idx_temp):
-            continue
+# ---------- Conversión de instantes (por lotes) ----------
+# "dd/mm/YYYY HH:MM", a veces con " h" final (equivale a los dos strptime de antes)
+_FECHA_RE = re.compile(r"(\d{1,2})/(\d{1,2})/(\d{4})\s+(\d{1,2}):(\d{1,2})(?: h)?")
 
-        fecha_txt = _clean_text(tds[idx_fecha].get_text())
-        temp_txt  = _clean_text(tds[idx_temp ].get_text())
+@lru_cache(maxsize=4096)
+def _local_day_offset(y, m, d):
+    """Offset UTC de Europe/Madrid para todo el día local, o None si ese día hay cambio de hora."""
+    first = datetime(y, m, d, 0, 0, tzinfo=TZ_LOCAL).utcoffset()
+    last = datetime(y, m, d, 23, 59, tzinfo=TZ_LOCAL).utcoffset()
+    return first if first == last else None
 
-        # Formato habitual AEMET: "dd/mm/YYYY HH:MM" (a veces con " h")
-        try:
-            dt_local = datetime.strptime(fecha_txt, "%d/%m/%Y %H:%M").replace(tzinfo=TZ_LOCAL)
-        except ValueError:
-            fecha_txt2 = fecha_txt.replace(" h", "")
-            try:
-                dt_local = datetime.strptime(fecha_txt2, "%d/%m/%Y %H:%M").replace(tzinfo=TZ_LOCAL)
-            except Exception:
-                continue
-
-        ts_utc = dt_local.astimezone(timezone.utc)
-        temp_c = _parse_float_celsius(temp_txt)
-        if temp_c is None:
-            continue
+@lru_cache(maxsize=4096)
+def _utc_day_offset(y, m, d):
+    """Offset de Europe/Madrid para todo el día UTC, o None si ese día hay cambio de hora."""
+    first = datetime(y, m, d, 0, 0, tzinfo=timezone.utc).astimezone(TZ_LOCAL).utcoffset()
+    last = datetime(y, m, d, 23, 59, tzinfo=timezone.utc).astimezone(TZ_LOCAL).utcoffset()
+    return first if first == last else None
+
+def _fecha_to_utc(fecha_txt: str):
+    """Texto de fecha/hora local AEMET -> datetime UTC (None si no parsea)."""
+    mt = _FECHA_RE.fullmatch(fecha_txt)
+    if mt is None:
+        return None
+    d, m, y, hh, mm = map(int, mt.groups())
+    try:
+        naive = datetime(y, m, d, hh, mm)
+    except ValueError:
+        return None
+    off = _local_day_offset(y, m, d)
+    if off is None:  # día de cambio de hora: resolución exacta
+        return naive.replace(tzinfo=TZ_LOCAL).astimezone(timezone.utc)
+    return (naive - off).replace(tzinfo=timezone.utc)
 
-        out.append((ts_utc, temp_c))
+def parse_local_timestamps(texts):
+    """Convierte en bloque textos 'dd/mm/YYYY HH:MM' locales a datetimes UTC (None si inválido)."""
+    return [_fecha_to_utc(_clean_text(t)) for t in texts]
 
+def format_csv_rows(pairs, source="AEMET_ult24h"):
+    """Filas [date_local, time_local, datetime_utc, temp_c, source] para write_csv."""
+    rows = []
+    for ts_utc, temp in pairs:
+        off = _utc_day_offset(ts_utc.year, ts_utc.month, ts_utc.day)
+        if off is None:  # día de cambio de hora: resolución exacta
+            loc = ts_utc.astimezone(TZ_LOCAL)
+        else:
+            loc = ts_utc.replace(tzinfo=None) + off
+        if ts_utc.microsecond:
+            iso = ts_utc.replace(tzinfo=timezone.utc).isoformat().replace("+00:00", "Z")
+        else:
+            iso = f"{ts_utc.year:04d}-{ts_utc.month:02d}-{ts_utc.day:02d}T{ts_utc.hour:02d}:{ts_utc.minute:02d}:{ts_utc.second:02d}Z"
+        rows.append([
+            f"{loc.year:04d}-{loc.month:02d}-{loc.day:02d}",
+            f"{loc.hour:02d}:{loc.minute:02d}",
+            iso,
+            f"{temp:.1f}",
+            source,
+        ])
+    return rows
+
+def csv_records(pairs, source="AEMET_ult24h"):
+    """Como format_csv_rows, pero como dicts con claves FIELDS (formato del histórico)."""
+    return [dict(zip(FIELDS, row)) for row in format_csv_rows(pairs, source)]
+
+def _row_to_pair(tds, idx_fecha, idx_temp):
+    """(ts_utc, temp_c) de una fila de textos de celda, o None si no es válida."""
+    if len(tds) <= max(idx_fecha, idx_temp):
+        return None
+
+    ts_utc = _fecha_to_utc(_clean_text(tds[idx_fecha]))
+    if ts_utc is None:
+        return None
+    temp_c = _parse_float_celsius(tds[idx_temp])
+    if temp_c is None:
+        return None
+    return ts_utc, temp_c
+
+def _dedup_sorted(out):
     # ordenar y deduplicar por timestamp
     out.sort(key=lambda x: x[0])
     uniq = {}
@@ -119,38 +555,385 @@ def parse_aemet_html_last24(html: str):
         uniq[ts] = v
     return [(ts, uniq[ts]) for ts in sorted(uniq.keys())]
 
+def _extract_table(html, backend=None):
+    """(layout, filas de textos de celda) de la tabla de datos; una sola extracción."""
+    extract = BACKENDS.get(backend or PARSER)
+    if extract is None:
+        raise RuntimeError(f"Backend de parser desconocido: {backend or PARSER} (opciones: {', '.join(BACKENDS)})")
+    headers, rows = extract(html)
+    headers = [_clean_text(h) for h in headers]
+    return resolve_layout(headers), rows
+
+def _last24_pairs(layout, rows):
+    idx_fecha, idx_temp = layout["fecha"], layout["temp"]
+
+    width = max(idx_fecha, idx_temp)
+    rows = [tds for tds in rows if len(tds) > width]
+    stamps = parse_local_timestamps([tds[idx_fecha] for tds in rows])
+
+    out = []
+    for ts_utc, tds in zip(stamps, rows):
+        if ts_utc is None:
+            continue
+        temp_c = _parse_float_celsius(tds[idx_temp])
+        if temp_c is not None:
+            out.append((ts_utc, temp_c))
+    return _dedup_sorted(out)
+
+def parse_aemet_html_last24(html: str, backend=None):
+    return _last24_pairs(*_extract_table(html, backend))
+
+
+# ---------- Extracción multivariable (todas las columnas numéricas) ----------
+_UNIT_SUFFIX_RE = re.compile(r"\s*(?:hpa|mm|l/m2|km/h|%)$", re.I)
+_THOUSANDS_RE = re.compile(r"[-+]?\d{1,3}(?:\.\d{3})+")
+
+def _parse_number_es(s: str):
+    """Número con formato español: '1.015,3', '1.015', '85 %', '12 km/h'; None si no parsea."""
+    s = _UNIT_SUFFIX_RE.sub("", _clean_text(s))
+    if s in ("", "-", "ND"):
+        return None
+    if "," in s:
+        s = s.replace(".", "").replace(",", ".")  # '.' de miles, ',' decimal
+    elif _THOUSANDS_RE.fullmatch(s):
+        s = s.replace(".", "")
+    try:
+        return float(s)
+    except ValueError:
+        return None
+
+def _parse_precip(s: str):
+    """Como _parse_number_es, pero 'Ip' (inapreciable, < 0,1 mm) cuenta como 0."""
+    if _clean_text(s).lower() == "ip":
+        return 0.0
+    return _parse_number_es(s)
+
+# (columna del histórico ancho, ¿es esta cabecera?, parser de la celda) — el
+# orden importa: la primera regla que casa se queda la cabecera. Las
+# direcciones (texto) se ignoran.
+WIDE_COLUMNS = [
+    ("temp_c",             _is_temp_header,                                                                  _parse_float_celsius),
+    ("wind_kmh",           lambda h: "velocidad" in _norm_header(h) and "direcci" not in _norm_header(h), _parse_number_es),
+    ("gust_kmh",           lambda h: "racha" in _norm_header(h) and "direcci" not in _norm_header(h),     _parse_number_es),
+    ("precip_mm",          lambda h: "precipitaci" in _norm_header(h),                                     _parse_precip),
+    ("pressure_trend_hpa", lambda h: "tendencia" in _norm_header(h),                                       _parse_number_es),
+    ("pressure_hpa",       lambda h: "presi" in _norm_header(h),                                           _parse_number_es),
+    ("rh_pct",             lambda h: "humedad" in _norm_header(h),                                         _parse_number_es),
+]
+WIDE_FIELDS = ["date_local", "time_local", "datetime_utc"] + [c for c, _, _ in WIDE_COLUMNS] + ["source"]
+_WIDE_PARSERS = {name: parse for name, _, parse in WIDE_COLUMNS}
+
+def resolve_wide_columns(headers):
+    """(idx_fecha, {columna: índice}) para todas las variables reconocidas."""
+    idx_fecha, _ = _resolve_columns(headers)
+    cols = {}
+    for i, h in enumerate(headers):
+        if i == idx_fecha:
+            continue
+        for name, match, _ in WIDE_COLUMNS:
+            if name not in cols and match(h):
+                cols[name] = i
+                break
+    return idx_fecha, cols
+
+# ---------- Caché de disposiciones de tabla ----------
+# La resolución de columnas se memoiza por firma de la tupla de cabeceras y se
+# persiste entre ejecuciones. Una firma nunca vista se avisa por stderr: suele
+# ser la primera pista de que AEMET ha cambiado la página. La caché guarda la
+# huella del código de las reglas de cabeceras (LAYOUT_RULES_VERSION), así que
+# cualquier cambio en _is_temp_header, WIDE_COLUMNS, etc. la invalida sola.
+def _const_repr(c):
+    if isinstance(c, (frozenset, set)):  # su orden depende de PYTHONHASHSEED
+        return "{" + ",".join(sorted(map(_const_repr, c))) + "}"
+    if isinstance(c, tuple):
+        return "(" + ",".join(map(_const_repr, c)) + ")"
+    return repr(c)
+
+def _code_digest(h, code):
+    h.update(code.co_code)
+    h.update(repr(code.co_names).encode("utf-8"))
+    for c in code.co_consts:
+        if hasattr(c, "co_code"):
+            _code_digest(h, c)
+        else:
+            h.update(_const_repr(c).encode("utf-8"))
+
+def rules_version() -> str:
+    """Huella de las reglas que resuelven columnas (funciones, lambdas y regex)."""
+    h = hashlib.sha1()
+    for fn in (_clean_text, _norm_header, _is_temp_header, _resolve_columns, resolve_wide_columns):
+        _code_digest(h, fn.__code__)
+    for name, match, _ in WIDE_COLUMNS:
+        h.update(name.encode("utf-8"))
+        _code_digest(h, match.__code__)
+    for rx in (_PUNCT_RE, _SPACES_RE, _C_UNIT_RE):
+        h.update(rx.pattern.encode("utf-8"))
+    return h.hexdigest()[:16]
+
+LAYOUT_CACHE = ".cache/aemet_layouts.json"
+LAYOUT_RULES_VERSION = rules_version()
+LAYOUT_STATS = {"hits": 0, "misses": 0, "new_signatures": 0}
+LAYOUT_AUTOSAVE = True  # False en procesos hijo: las firmas nuevas solo se apuntan (ver take_new_layouts)
+_layouts = None
+_new_layouts = {}
+_layouts_lock = threading.Lock()
+
+def layout_signature(headers) -> str:
+    return hashlib.sha1("\x1f".join(headers).encode("utf-8")).hexdigest()[:16]
+
+def _load_layouts():
+    if not LAYOUT_CACHE:
+        return {}
+    try:
+        with open(LAYOUT_CACHE, encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if data.get("rules_version") != LAYOUT_RULES_VERSION:
+        return {}
+    return data.get("layouts", {})
+
+def _save_layouts():
+    if not LAYOUT_CACHE:
+        return
+    os.makedirs(os.path.dirname(LAYOUT_CACHE) or ".", exist_ok=True)
+    tmp = f"{LAYOUT_CACHE}.{os.getpid()}.tmp"  # varios procesos de parseo pueden guardar a la vez
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"rules_version": LAYOUT_RULES_VERSION, "layouts": _layouts}, f, indent=1, ensure_ascii=False)
+    os.replace(tmp, LAYOUT_CACHE)
+
+def _announce_layout(sig, entry):
+    LAYOUT_STATS["new_signatures"] += 1
+    print(f"WARN: nueva disposición de tabla AEMET (firma {sig}): {entry['headers']}", file=sys.stderr)
+
+def resolve_layout(headers):
+    """
+    {'fecha': i, 'temp': j, 'wide': {columna: índice}} para cabeceras ya
+    limpias. Los errores (columnas no encontradas) no se memoizan.
+    """
+    global _layouts
+    sig = layout_signature(headers)
+    with _layouts_lock:
+        if _layouts is None:
+            _layouts = _load_layouts()
+        hit = _layouts.get(sig)
+        if hit is not None:
+            LAYOUT_STATS["hits"] += 1
+            return hit
+        LAYOUT_STATS["misses"] += 1
+
+    idx_fecha, idx_temp = _resolve_columns(headers)
+    _, wide = resolve_wide_columns(headers)
+    entry = {
+        "fecha": idx_fecha, "temp": idx_temp, "wide": wide, "headers": list(headers),
+        "first_seen": datetime.now(timezone.utc).replace(microsecond=0).isoformat().replace("+00:00", "Z"),
+    }
+    with _layouts_lock:
+        if sig not in _layouts:
+            _layouts[sig] = entry
+            if LAYOUT_AUTOSAVE:
+                _announce_layout(sig, entry)
+                _save_layouts()
+            else:
+                _new_layouts[sig] = entry
+    return entry
+
+def take_new_layouts():
+    """Firmas nuevas apuntadas con LAYOUT_AUTOSAVE = False desde la última llamada ({firma: disposición})."""
+    with _layouts_lock:
+        new = dict(_new_layouts)
+        _new_layouts.clear()
+    return new
+
+def add_layouts(entries):
+    """
+    Incorpora disposiciones resueltas en otros procesos (take_new_layouts):
+    las que no estaban se cuentan en LAYOUT_STATS y se avisan aquí, y la caché
+    se guarda una vez. Devuelve cuántas eran nuevas.
+    """
+    global _layouts
+    with _layouts_lock:
+        if _layouts is None:
+            _layouts = _load_layouts()
+        new = [(sig, e) for sig, e in entries.items() if sig not in _layouts]
+        for sig, entry in new:
+            _layouts[sig] = entry
+            _announce_layout(sig, entry)
+        if new:
+            _save_layouts()
+    return len(new)
+
+def _wide_rows(layout, rows):
+    idx_fecha, cols = layout["fecha"], layout["wide"]
+
+    width = max([idx_fecha, *cols.values()])
+    rows = [tds for tds in rows if len(tds) > width]
+    stamps = parse_local_timestamps([tds[idx_fecha] for tds in rows])
+
+    out = []
+    for ts_utc, tds in zip(stamps, rows):
+        if ts_utc is None:
+            continue
+        values = {name: _WIDE_PARSERS[name](tds[i]) for name, i in cols.items()}
+        if any(v is not None for v in values.values()):
+            out.append((ts_utc, values))
+    return _dedup_sorted(out)
+
+def parse_aemet_html_wide(html: str, backend=None):
+    """
+    Una pasada sobre la tabla: [(ts_utc, {columna: float | None})] ordenado y
+    sin duplicados, con todas las variables de WIDE_COLUMNS presentes en la página.
+    """
+    return _wide_rows(*_extract_table(html, backend))
+
+def parse_aemet_html_both(html: str, backend=None):
+    """
+    (pares de parse_aemet_html_last24, filas de parse_aemet_html_wide) con una
+    sola extracción de la tabla. Los pares no se derivan de las filas anchas:
+    en horas repetidas (cambio de hora de octubre) aquellas descartan antes las
+    temperaturas vacías y pueden quedarse con otra fila.
+    """
+    layout, rows = _extract_table(html, backend)
+    return _last24_pairs(layout, rows), _wide_rows(layout, rows)
+
+def wide_records(wide, source="AEMET_ult24h"):
+    """Filas del histórico ancho (dicts con WIDE_FIELDS); vacío donde falta el dato."""
+    base = format_csv_rows([(ts, 0.0) for ts, _ in wide], source)
+    out = []
+    for (date_local, time_local, iso, _, src), (_, values) in zip(base, wide):
+        r = {"date_local": date_local, "time_local": time_local, "datetime_utc": iso, "source": src}
+        for name, _, _ in WIDE_COLUMNS:
+            v = values.get(name)
+            r[name] = "" if v is None else f"{v:.1f}"
+        out.append(r)
+    return out
+
+
+# ---------- Extracción en streaming desde el socket ----------
+def iter_rows_streaming(chunks):
+    """
+    Generador de (ts_utc, temp_c) a partir de trozos de texto HTML: cada fila
+    se emite en cuanto se cierra su <tr> y se deja de consumir `chunks` al
+    cerrarse la tabla. Sin ordenar ni deduplicar (ver fetch_pairs_streaming).
+    """
+    p = _TablaDatosParser()
+    cols = None
+    pending = p.rows
+    for chunk in chunks:
+        p.feed(chunk)
+        if pending:
+            if cols is None:
+                layout = resolve_layout([_clean_text(h) for h in p.headers])
+                cols = (layout["fecha"], layout["temp"])
+            for in_tbody, tds in pending:
+                if in_tbody or not p.seen_tbody:
+                    pair = _row_to_pair(tds, *cols)
+                    if pair is not None:
+                        yield pair
+            del pending[:]
+        if p.done:
+            return
+    if not p.found_table:
+        raise RuntimeError("No se encontró la tabla de datos en el HTML de AEMET")
+    if not p.found_thead:
+        raise RuntimeError("La tabla no contiene THEAD con cabeceras")
+
+def iter_html_chunks(url=URL, session=None, chunk_size=STREAM_CHUNK):
+    """Trozos de texto de la respuesta según llegan; cierra el socket al salir."""
+    r = _get(url, session, stream=True)
+    try:
+        r.raise_for_status()
+        decoder = codecs.getincrementaldecoder(r.encoding or "utf-8")(errors="replace")
+        for raw in r.iter_content(chunk_size=chunk_size):
+            yield decoder.decode(raw)
+        yield decoder.decode(b"", final=True)
+    finally:
+        r.close()
+
+def fetch_pairs_streaming(url=URL, session=None):
+    """Equivalente a parse_aemet_html_last24(fetch_html()) sin descargar la página entera."""
+    return _dedup_sorted(list(iter_rows_streaming(iter_html_chunks(url, session))))
+
 
 # ---------- Escritura CSV ----------
-def write_csv(pairs):
+def render_csv(pairs) -> str:
+    """Contenido exacto que write_csv escribiría para `pairs`."""
+    buf = io.StringIO()
+    w = csv.writer(buf)
+    w.writerow(FIELDS)
+    w.writerows(format_csv_rows(pairs))
+    return buf.getvalue()
+
+def write_csv(pairs, out=OUT):
     """
     pairs: lista de (ts_utc, temp_c)
-    Guarda OUT con cabecera: date_local,time_local,datetime_utc,temp_c,source
-    """
-    with open(OUT, "w", encoding="utf-8", newline="") as f:
-        w = csv.writer(f)
-        w.writerow(["date_local", "time_local", "datetime_utc", "temp_c", "source"])
-        for ts_utc, temp in pairs:
-            ts_loc = ts_utc.astimezone(TZ_LOCAL)
-            w.writerow([
-                ts_loc.strftime("%Y-%m-%d"),
-                ts_loc.strftime("%H:%M"),
-                ts_utc.replace(tzinfo=timezone.utc).isoformat().replace("+00:00","Z"),
-                f"{temp:.1f}",
-                "AEMET_ult24h"
-            ])
+    Guarda out (por defecto OUT) con cabecera: date_local,time_local,datetime_utc,temp_c,source
+    """
+    with open(out, "w", encoding="utf-8", newline="") as f:
+        f.write(render_csv(pairs))
+
+
+# ---------- Huella de contenido ----------
+def fingerprint_pairs(pairs) -> str:
+    return hashlib.sha256(render_csv(pairs).encode("utf-8")).hexdigest()
+
+def fingerprint_file(path) -> str:
+    """sha256 del fichero, o '' si no existe."""
+    try:
+        with open(path, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except OSError:
+        return ""
+
+def set_step_output(name, value):
+    """Publica name=value como salida del paso en GitHub Actions (no-op fuera de Actions)."""
+    path = os.environ.get("GITHUB_OUTPUT")
+    if path:
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(f"{name}={value}\n")
 
 
 # ---------- Main ----------
-def main():
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Captura las últimas 24h de AEMET 9091R")
+    ap.add_argument("--stream", action="store_true",
+                    help="parsea la respuesta por trozos y corta la descarga al acabar la tabla")
+    ap.add_argument("--no-cache", action="store_true",
+                    help=f"ignora la caché HTTP condicional ({HTTP_CACHE})")
+    args = ap.parse_args(argv)
+    start_run()
     try:
         ensure_dirs()
-        html = fetch_html()
-        pairs = parse_aemet_html_last24(html)
+        cache = entry = None
+        if args.stream:
+            pairs = fetch_pairs_streaming()
+        else:
+            if args.no_cache:
+                html = fetch_html()
+            else:
+                cache = load_http_cache()
+                # sin CSV previo no podemos dar por buena una respuesta "sin cambios"
+                prev = cache.get(URL) if os.path.exists(OUT) else None
+                html, entry = fetch_html_conditional(URL, entry=prev)
+                if html is None:
+                    print(f"OK: no-op, sin cambios en AEMET desde la última captura; {OUT} no se toca")
+                    set_step_output("changed", "false")
+                    return
+            pairs = parse_aemet_html_last24(html)
         print(f"INFO: HTML AEMET: {len(pairs)} registros válidos")
         if not pairs:
             print("ERROR: No se obtuvieron registros", file=sys.stderr)
             sys.exit(2)
-        write_csv(pairs)
+        changed = fingerprint_pairs(pairs) != fingerprint_file(OUT)
+        if changed:
+            write_csv(pairs)
+        if cache is not None:
+            cache[URL] = entry
+            save_http_cache(cache)
+        set_step_output("changed", "true" if changed else "false")
+        if not changed:
+            print(f"OK: no-op, {len(pairs)} registros idénticos a {OUT}")
+            return
         print(f"OK: {len(pairs)} registros. CSV -> {OUT}")
     except Exception as e:
         print(f"ERROR: {e}", file=sys.stderr)
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Detección de huecos horarios en el histórico y re-captura dirigida.
+
+Un hueco es una hora en punto (UTC) sin fila en el histórico, entre la
+primera observación y la última hora que AEMET ya debería haber publicado.
+Solo las horas de las últimas RECOVERABLE_HOURS siguen en la página
+'ultimosdatos'; para esas estaciones se hace una única petición y se
+insertan solo las filas que tapan huecos. El resto se informa como
+irrecuperable (candidatas a backfill_opendata.py).
+
+collector_daemon.py hace esta re-captura por su cuenta cada GAP_SCAN_EVERY;
+'fill' queda para uso manual o con los capturadores de una sola pasada.
+
+Uso:
+    python scripts/gaps.py scan [--since 2025-11-01] [--json gaps.json]
+    python scripts/gaps.py fill [--stations scripts/stations.json] [--shards --daily --hdd --bin]
+"""
+import argparse, json, sys
+from datetime import datetime, timedelta, timezone
+
+import update_archive
+from update_archive import ARCHIVE_PATTERN
+from collect_stations import STATIONS, load_stations, make_session
+from fetch_aemet_9091R import csv_records, fetch_html, parse_aemet_html_last24
+
+RECOVERABLE_HOURS = 24
+PUBLISH_DELAY_HOURS = 1  # AEMET publica cada hora con algo de retraso
+HOUR = timedelta(hours=1)
+
+
+def _iso(dt):
+    return dt.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+def _parse_iso(s):
+    return datetime.fromisoformat(s.replace("Z", "+00:00"))
+
+
+# ---------- Índice de huecos ----------
+def find_gaps(keys, until):
+    """
+    keys: datetime_utc (ISO 'Z') ordenados. Devuelve [(inicio, fin)] inclusivos
+    de horas ausentes entre la primera clave y `until` (datetime UTC).
+    """
+    gaps = []
+    prev = None
+    for k in keys:
+        t = _parse_iso(k)
+        if prev is not None and t - prev > HOUR:
+            gaps.append((prev + HOUR, t - HOUR))
+        prev = t if prev is None else max(prev, t)
+    if prev is not None and until - prev >= HOUR:
+        gaps.append((prev + HOUR, until))
+    return gaps
+
+def split_recoverable(gaps, now, hours=RECOVERABLE_HOURS):
+    """Parte los huecos en (recuperables desde la página de 24h, irrecuperables)."""
+    limit = now - timedelta(hours=hours)
+    rec, lost = [], []
+    for a, b in gaps:
+        if b < limit:
+            lost.append((a, b))
+        elif a >= limit:
+            rec.append((a, b))
+        else:
+            cut = limit.replace(minute=0, second=0, microsecond=0) + (HOUR if limit.minute or limit.second else timedelta(0))
+            if cut > a: lost.append((a, cut - HOUR))
+            rec.append((cut, b))
+    return rec, lost
+
+def n_hours(gaps):
+    return sum(int((b - a) / HOUR) + 1 for a, b in gaps)
+
+def scan(stations, now=None, since=None):
+    """{ estación: {"recoverable": [...], "unrecoverable": [...]} } con intervalos ISO."""
+    now = now or datetime.now(timezone.utc)
+    until = now.replace(minute=0, second=0, microsecond=0) - timedelta(hours=PUBLISH_DELAY_HOURS)
+    index = {}
+    for sid in stations:
+        path = ARCHIVE_PATTERN.format(station=sid)
+        rows = update_archive.read_tail(since, path) if since else update_archive.read_csv(path)
+        rec, lost = split_recoverable(find_gaps([r["datetime_utc"] for r in rows], until), now)
+        index[sid] = {
+            "recoverable": [[_iso(a), _iso(b)] for a, b in rec],
+            "unrecoverable": [[_iso(a), _iso(b)] for a, b in lost],
+        }
+    return index
+
+
+# ---------- Re-captura dirigida ----------
+def _missing_keys(intervals):
+    keys = set()
+    for a, b in intervals:
+        t, end = _parse_iso(a), _parse_iso(b)
+        while t <= end:
+            keys.add(_iso(t))
+            t += HOUR
+    return keys
+
+def fill(stations, index, session=None, **derived):
+    """
+    Una petición por estación con huecos recuperables; inserta solo las filas
+    que los tapan. Las filas pasan por update_archive.archive_rows, así que
+    `derived` (bin/shards/daily/hdd) recalcula también esas horas en las salidas
+    derivadas del histórico principal. Devuelve { estación: nº horas recuperadas | Exception }.
+    """
+    session = session or make_session()
+    results = {}
+    for sid, st in stations.items():
+        missing = _missing_keys(index.get(sid, {}).get("recoverable", []))
+        if not missing:
+            continue
+        try:
+            pairs = parse_aemet_html_last24(fetch_html(st["url"], session=session))
+            rows = [r for r in csv_records(pairs) if r["datetime_utc"] in missing]
+            if rows:
+                path = ARCHIVE_PATTERN.format(station=sid)
+                if update_archive.is_main_archive(path):
+                    update_archive.archive_rows(rows, path=path, **derived)
+                else:
+                    update_archive.merge_rows(rows, path)
+            results[sid] = len(rows)
+        except Exception as e:
+            results[sid] = e
+    return results
+
+
+# ---------- Main ----------
+def _report(index):
+    for sid, g in sorted(index.items()):
+        rec = [(_parse_iso(a), _parse_iso(b)) for a, b in g["recoverable"]]
+        lost = [(_parse_iso(a), _parse_iso(b)) for a, b in g["unrecoverable"]]
+        print(f"INFO: {sid}: {n_hours(rec)} h recuperables, {n_hours(lost)} h irrecuperables")
+        for a, b in g["unrecoverable"]:
+            print(f"WARN: {sid}: hueco irrecuperable {a} .. {b}")
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Huecos horarios del histórico")
+    ap.add_argument("cmd", choices=["scan", "fill"])
+    ap.add_argument("--stations", default=STATIONS)
+    ap.add_argument("--since", help="solo revisa desde este instante ISO (lee la cola del histórico)")
+    ap.add_argument("--json", help="guarda el índice de huecos en este fichero")
+    for flag in ("bin", "shards", "daily", "hdd"):
+        ap.add_argument(f"--{flag}", action="store_true", help=f"con fill: como update_archive.py --{flag}")
+    args = ap.parse_args(argv)
+
+    stations = load_stations(args.stations)
+    since = _iso(_parse_iso(args.since).astimezone(timezone.utc)) if args.since else None
+    index = scan(stations, since=since)
+
+    if args.cmd == "fill":
+        failed = 0
+        derived = {k: getattr(args, k) for k in ("bin", "shards", "daily", "hdd")}
+        for sid, res in sorted(fill(stations, index, **derived).items()):
+            if isinstance(res, Exception):
+                failed += 1
+                print(f"ERROR: {sid}: {res}", file=sys.stderr)
+            else:
+                print(f"OK: {sid}: {res} horas recuperadas")
+        index = scan(stations, since=since)
+        if failed:
+            _report(index)
+            sys.exit(2)
+
+    _report(index)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(index, f, indent=1)
+            f.write("\n")
+
+if __name__ == "__main__":
+    main()
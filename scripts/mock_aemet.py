@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Servidor local que imita la página 'ultimosdatos' de AEMET para N estaciones
+sintéticas (o sirve páginas grabadas), con latencia, tasa de errores y tamaño
+de página configurables. Sirve para medir el recolector sin tocar aemet.es.
+
+También imita los valores climatológicos diarios de OpenData
+(/opendata/api/valores/climatologicos/diarios/..., con la respuesta
+{estado, datos} y el segundo salto a 'datos') a partir de los ficheros
+opendata_<estación>_diarios.json de --opendata-dir, para probar
+backfill_opendata.py con --base-url http://127.0.0.1:8800/opendata.
+
+Uso:
+    python scripts/mock_aemet.py [--port 8800] [--latency-ms 150] [--error-rate 0.02]
+                                 [--rows 24] [--padding-kb 200] [--pages-dir grabadas/]
+                                 [--opendata-dir scripts/fixtures] [--opendata-quota 3]
+
+Las URLs son las de URL_TEMPLATE con el host sustituido por el del servidor:
+    http://127.0.0.1:8800/es/eltiempo/observacion/ultimosdatos?k=pva&l=<id>&...
+"""
+import argparse, glob, json, os, random, threading, time, zlib
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from fetch_aemet_9091R import TZ_LOCAL, URL_TEMPLATE
+
+OPENDATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+OPENDATA_DAILY = "/opendata/api/valores/climatologicos/diarios/datos/"
+
+HEADERS_ROW = [
+    "Fecha y hora oficial", "Temperatura (ºC)", "Velocidad del viento (km/h)", "Dirección del viento",
+    "Racha (km/h)", "Dirección de racha", "Precipitación (mm)", "Presión (hPa)", "Tendencia (hPa)", "Humedad (%)",
+]
+
+
+def synthetic_page(station, rows=24, padding_kb=0, now=None):
+    """Página HTML con la misma estructura de tabla que AEMET y datos deterministas por estación."""
+    rnd = random.Random(zlib.crc32(station.encode("utf-8")))
+    now = (now or datetime.now(timezone.utc)).astimezone(TZ_LOCAL).replace(minute=0, second=0, microsecond=0)
+    trs = []
+    for i in range(rows):
+        t = now - timedelta(hours=i)
+        trs.append(
+            "<tr>" + "".join(f"<td>{v}</td>" for v in (
+                t.strftime("%d/%m/%Y %H:%M"), f"{rnd.uniform(-5, 25):.1f}".replace(".", ","),
+                rnd.randint(0, 40), "Noroeste", rnd.randint(0, 70), "Norte",
+                f"{rnd.uniform(0, 3):.1f}".replace(".", ","), f"{rnd.uniform(990, 1030):.1f}".replace(".", ","),
+                f"{rnd.uniform(-2, 2):.1f}".replace(".", ","), rnd.randint(30, 100),
+            )) + "</tr>"
+        )
+    pad = "<div class='menu'>" + "<a href='#'>enlace</a>" * (padding_kb * 1024 // 24) + "</div>"
+    ths = "".join(f"<th>{h}</th>" for h in HEADERS_ROW)
+    return (
+        f"<!doctype html><html><head><title>Últimos datos {station}</title></head><body>{pad}"
+        f"<table class='tabla_datos' id='table'><thead><tr>{ths}</tr></thead>"
+        f"<tbody>{''.join(trs)}</tbody></table>{pad}</body></html>"
+    )
+
+
+class MockAemet(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, addr, latency_ms=0.0, error_rate=0.0, rows=24, padding_kb=0, pages_dir=None,
+                 opendata_dir=OPENDATA_DIR, opendata_quota=None):
+        super().__init__(addr, _Handler)
+        self.latency_ms = latency_ms
+        self.error_rate = error_rate
+        self.rows = rows
+        self.padding_kb = padding_kb
+        self.recorded = []
+        if pages_dir:
+            for fn in sorted(glob.glob(os.path.join(pages_dir, "*.html"))):
+                with open(fn, "rb") as f:
+                    self.recorded.append(f.read())
+        self.opendata = {}  # estación -> registros climatológicos diarios
+        for fn in sorted(glob.glob(os.path.join(opendata_dir or "", "opendata_*_diarios.json"))):
+            with open(fn, encoding="utf-8") as f:
+                self.opendata[os.path.basename(fn)[len("opendata_"):-len("_diarios.json")]] = json.load(f)
+        self.opendata_quota = opendata_quota  # respuestas 'datos' servidas antes de contestar 429
+        self._datos = {}
+        self._pages = {}
+        self._lock = threading.Lock()
+        self.requests = 0
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def opendata_url(self):
+        return self.base_url + "/opendata"
+
+    def url_for(self, station, prov="pva"):
+        return URL_TEMPLATE.format(prov=prov, station=station).replace("https://www.aemet.es", self.base_url)
+
+    def page(self, station):
+        with self._lock:
+            self.requests += 1
+            body = self._pages.get(station)
+            if body is None:
+                if self.recorded:
+                    body = self.recorded[zlib.crc32(station.encode("utf-8")) % len(self.recorded)]
+                else:
+                    body = synthetic_page(station, self.rows, self.padding_kb).encode("utf-8")
+                self._pages[station] = body
+            return body
+
+    def opendata_meta(self, path):
+        """Primer salto: {estado, datos} para .../fechaini/<ini>/fechafin/<fin>/estacion/<id>."""
+        parts = path[len(OPENDATA_DAILY):].split("/")
+        args = dict(zip(parts[::2], parts[1::2]))
+        ini, fin = args.get("fechaini", "")[:10], args.get("fechafin", "")[:10]
+        recs = [r for r in self.opendata.get(args.get("estacion"), []) if ini <= r["fecha"] <= fin]
+        if not recs:
+            return {"descripcion": "No hay datos que satisfagan esos criterios", "estado": 404}
+        with self._lock:
+            token = f"{len(self._datos):08x}"
+            self._datos[token] = recs
+        return {"descripcion": "exito", "estado": 200, "datos": f"{self.opendata_url}/sh/{token}"}
+
+    def opendata_datos(self, token):
+        """Segundo salto; None si se agotó la cuota (429), KeyError si el token no existe."""
+        with self._lock:
+            if self.opendata_quota is not None:
+                if self.opendata_quota <= 0:
+                    return None
+                self.opendata_quota -= 1
+            return self._datos[token]
+
+    def start(self):
+        """Arranca en un hilo de fondo y devuelve self."""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _send_json(self, obj, status=200):
+        # OpenData responde en ISO-8859-15
+        body = json.dumps(obj, ensure_ascii=False).encode("iso-8859-15", errors="replace")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=ISO-8859-15")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        srv = self.server
+        url = urlsplit(self.path)
+        q = parse_qs(url.query)
+        station = (q.get("l") or [""])[0]
+        if srv.latency_ms:
+            time.sleep(random.expovariate(1.0 / srv.latency_ms) / 1000)
+        if url.path.startswith("/opendata/"):
+            self._opendata(url.path)
+            return
+        if not station:
+            self.send_error(404)
+            return
+        if random.random() < srv.error_rate:
+            self.send_error(503, "Servicio no disponible (simulado)")
+            return
+        body = srv.page(station)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=UTF-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _opendata(self, path):
+        srv = self.server
+        if random.random() < srv.error_rate:
+            self.send_error(503, "Servicio no disponible (simulado)")
+        elif path.startswith(OPENDATA_DAILY):
+            self._send_json(srv.opendata_meta(path))
+        elif path.startswith("/opendata/sh/"):
+            try:
+                recs = srv.opendata_datos(path.rsplit("/", 1)[-1])
+            except KeyError:
+                self.send_error(404)
+                return
+            if recs is None:
+                self._send_json({"descripcion": "Límite de peticiones o caudal por minuto excedido", "estado": 429}, 429)
+            else:
+                self._send_json(recs)
+        else:
+            self.send_error(404)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Servidor AEMET simulado")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8800)
+    ap.add_argument("--latency-ms", type=float, default=0.0, help="latencia media (exponencial)")
+    ap.add_argument("--error-rate", type=float, default=0.0, help="fracción de respuestas 503")
+    ap.add_argument("--rows", type=int, default=24, help="filas por página sintética")
+    ap.add_argument("--padding-kb", type=int, default=0, help="markup de relleno antes y después de la tabla")
+    ap.add_argument("--pages-dir", help="sirve páginas grabadas (*.html) en lugar de sintéticas")
+    ap.add_argument("--opendata-dir", default=OPENDATA_DIR, help="ficheros opendata_<estación>_diarios.json")
+    ap.add_argument("--opendata-quota", type=int, help="respuestas de datos OpenData antes de contestar siempre 429")
+    args = ap.parse_args(argv)
+
+    srv = MockAemet((args.host, args.port), args.latency_ms, args.error_rate, args.rows, args.padding_kb, args.pages_dir,
+                    args.opendata_dir, args.opendata_quota)
+    print(f"INFO: AEMET simulado en {srv.url_for('<id>')}")
+    print(f"INFO: OpenData simulado en {srv.opendata_url} ({', '.join(sorted(srv.opendata)) or 'sin datos'})")
+    try:
+        srv.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Captura + archivado en un solo proceso: las filas parseadas pasan en memoria
+a la fusión del histórico (update_archive.archive_rows) sin escribir y releer
+el CSV horario, que solo se genera si se pide con --hourly-out.
+
+Uso:
+    python scripts/pipeline.py [--hourly-out] [--shards --daily --hdd --bin] [--all-stations]
+                               [--snapshots [DIR]]
+"""
+import argparse, os, sys
+
+import update_archive
+from update_archive import ARCHIVE_PATTERN
+from collect_stations import STATIONS, load_stations, make_session
+from fetch_aemet_9091R import (
+    OUT, STATION, URL, csv_records, ensure_dirs, fetch_html, fetch_html_conditional,
+    fingerprint_file, fingerprint_pairs, load_http_cache, parse_aemet_html_last24,
+    parse_aemet_html_both, pool_report, save_http_cache, set_step_output, start_run, wide_records,
+    write_csv, LAYOUT_STATS, WIDE_FIELDS,
+)
+from snapshots import SNAPSHOT_DIR, SnapshotStore
+
+WIDE_PATTERN = "docs/data/{station}_wide_history.csv"
+
+
+def run_station(sid, url, hourly_out=None, session=None, cache=None, wide=False, store=None, **derived):
+    """
+    Captura una estación y fusiona sus filas en su histórico. `derived`
+    (bin/shards/daily/hdd) solo aplica al histórico principal de update_archive.
+    Con `wide` se extraen todas las variables de la tabla en la misma pasada y
+    se archivan también en WIDE_PATTERN. Con `store` (SnapshotStore) se guarda
+    la página descargada antes de parsearla. Devuelve True si algo cambió.
+    """
+    entry = None
+    if cache is None:
+        html = fetch_html(url, session=session)
+    else:
+        prev = cache.get(url) if hourly_out is None or os.path.exists(hourly_out) else None
+        html, entry = fetch_html_conditional(url, session=session, entry=prev)
+        if html is None:
+            print(f"OK: {sid}: no-op, sin cambios en AEMET desde la última captura")
+            return False
+    if store is not None:
+        store.put(sid, html)
+    if wide:
+        pairs, wide_rows = parse_aemet_html_both(html)
+    else:
+        pairs = parse_aemet_html_last24(html)
+    print(f"INFO: {sid}: HTML AEMET: {len(pairs)} registros válidos")
+    if not pairs:
+        raise RuntimeError("No se obtuvieron registros")
+
+    changed = False
+    if hourly_out is not None and fingerprint_pairs(pairs) != fingerprint_file(hourly_out):
+        ensure_dirs(hourly_out)
+        write_csv(pairs, hourly_out)
+        changed = True
+
+    rows = csv_records(pairs)
+    path = ARCHIVE_PATTERN.format(station=sid)
+    if path == update_archive.ARCHIVE:
+        changed = update_archive.archive_rows(rows, **derived) or changed
+    else:
+        changed = update_archive.merge_rows(rows, path) or changed
+    if wide:
+        wide_path = WIDE_PATTERN.format(station=sid)
+        changed = update_archive.merge_rows(wide_records(wide_rows), wide_path, WIDE_FIELDS) or changed
+
+    if cache is not None:
+        cache[url] = entry
+    return changed
+
+
+# ---------- Main ----------
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Captura AEMET y archiva en un solo proceso")
+    ap.add_argument("--hourly-out", action="store_true", help="escribe también el CSV horario de cada estación")
+    ap.add_argument("--all-stations", action="store_true", help=f"todas las estaciones de {STATIONS}")
+    ap.add_argument("--stations", default=STATIONS)
+    ap.add_argument("--no-cache", action="store_true", help="ignora la caché HTTP condicional")
+    ap.add_argument("--wide", action="store_true",
+                    help=f"archiva también todas las variables numéricas en {WIDE_PATTERN}")
+    ap.add_argument("--snapshots", nargs="?", const=SNAPSHOT_DIR, metavar="DIR",
+                    help=f"guarda cada página descargada en el almacén de snapshots.py (por defecto {SNAPSHOT_DIR})")
+    for flag in ("bin", "shards", "daily", "hdd"):
+        ap.add_argument(f"--{flag}", action="store_true", help=f"como update_archive.py --{flag}")
+    args = ap.parse_args(argv)
+    start_run()
+
+    if args.all_stations:
+        stations = load_stations(args.stations)
+    else:
+        stations = {STATION: {"url": URL, "out": OUT}}
+    derived = {k: getattr(args, k) for k in ("bin", "shards", "daily", "hdd")}
+    cache = None if args.no_cache else load_http_cache()
+    session = make_session()
+    store = SnapshotStore(args.snapshots) if args.snapshots else None
+
+    changed = failed = 0
+    for sid, st in stations.items():
+        try:
+            hourly_out = st["out"] if args.hourly_out else None
+            changed += run_station(sid, st["url"], hourly_out, session, cache, args.wide, store, **derived)
+        except Exception as e:
+            failed += 1
+            print(f"ERROR: {sid}: {e}", file=sys.stderr)
+    if cache is not None:
+        save_http_cache(cache)
+    print(f"INFO: HTTP: {pool_report()}")
+    set_step_output("changed", "true" if changed else "false")
+    set_step_output("new_layouts", LAYOUT_STATS["new_signatures"])
+    if failed:
+        sys.exit(2)
+
+if __name__ == "__main__":
+    main()
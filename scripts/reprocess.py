@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Reprocesa páginas AEMET guardadas (p. ej. tras mejorar _is_temp_header):
+parsea en paralelo todos los .html(.gz) de un directorio, o las páginas del
+almacén de snapshots.py, y fusiona el resultado en el histórico.
+
+Uso:
+    python scripts/reprocess.py paginas/ --station 9091R [--workers N] [--chunksize 16]
+    python scripts/reprocess.py --store .cache/snapshots [--station 9091R] [--since 2025-01-01]
+                                [--archive docs/data/9091R_temp_history.csv] [--dry-run]
+                                [--shards --daily --hdd --bin]
+
+Se reprocesa una estación por vez: con --store se toman solo sus páginas, y
+un directorio se trata entero como de la estación indicada con --station
+(obligatorio). El histórico por defecto es el de esa estación, y las salidas
+derivadas (--bin/--shards/--daily/--hdd) solo existen para 9091R.
+
+Los ficheros se reparten por lotes entre procesos pero los resultados se
+recogen en el orden de sus rutas (o de descarga, con --store); si dos páginas
+traen la misma hora, gana la posterior (los nombres con fecha ordenan
+cronológicamente), así que la salida no depende del número de procesos.
+"""
+import argparse, os, sys, time
+from multiprocessing import Pool
+
+import update_archive
+from update_archive import ARCHIVE_PATTERN
+from fetch_aemet_9091R import STATION, csv_records, parse_aemet_html_last24
+from snapshots import SnapshotStore, read_blob
+
+CHUNKSIZE = 16  # ficheros por lote enviado a cada proceso
+
+
+def find_snapshots(root):
+    found = []
+    for dirpath, _, files in os.walk(root):
+        found.extend(os.path.join(dirpath, fn) for fn in files if fn.endswith((".html", ".html.gz", ".html.zst")))
+    return sorted(found)
+
+def read_snapshot(path):
+    if path.endswith((".gz", ".zst")):
+        return read_blob(path)
+    with open(path, encoding="utf-8", errors="replace") as f:
+        return f.read()
+
+def _parse_file(path):
+    """(pares, None) o (None, error); en el proceso hijo, sin propagar excepciones."""
+    try:
+        return parse_aemet_html_last24(read_snapshot(path)), None
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}"
+
+def parse_all(paths, workers=None, chunksize=CHUNKSIZE):
+    """{ts_utc: temp_c} combinando todas las páginas (gana la última ruta) y lista de (ruta, error)."""
+    by_ts, errors = {}, []
+    with Pool(processes=workers) as pool:
+        # imap conserva el orden de `paths` aunque los lotes acaben desordenados
+        for path, (pairs, err) in zip(paths, pool.imap(_parse_file, paths, chunksize=chunksize)):
+            if err is not None:
+                errors.append((path, err))
+                continue
+            by_ts.update(pairs)
+    return by_ts, errors
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Reprocesa páginas AEMET guardadas en paralelo")
+    ap.add_argument("root", nargs="?", help="directorio con las páginas (.html, .html.gz o .html.zst, recursivo)")
+    ap.add_argument("--store", help="lee las páginas del almacén de snapshots.py en este directorio")
+    ap.add_argument("--station", help=f"estación de las páginas (con --store, por defecto {STATION}; "
+                                      "obligatoria con un directorio)")
+    ap.add_argument("--since", help="con --store: descargas desde esta fecha/hora UTC ISO")
+    ap.add_argument("--until", help="con --store: descargas anteriores a esta fecha/hora UTC ISO")
+    ap.add_argument("--workers", type=int, default=None, help="procesos (por defecto, nº de CPUs)")
+    ap.add_argument("--chunksize", type=int, default=CHUNKSIZE)
+    ap.add_argument("--archive", help="histórico en el que fusionar (por defecto, el de la estación)")
+    ap.add_argument("--dry-run", action="store_true", help="parsea e informa sin tocar el histórico")
+    for flag in ("bin", "shards", "daily", "hdd"):
+        ap.add_argument(f"--{flag}", action="store_true", help=f"como update_archive.py --{flag}")
+    args = ap.parse_args(argv)
+
+    if (args.root is None) == (args.store is None):
+        ap.error("indica un directorio o --store")
+    if args.root and args.station is None:
+        ap.error("con un directorio indica --station: todas sus páginas se fusionan en el histórico de esa estación")
+    station = args.station or STATION
+    archive = args.archive or ARCHIVE_PATTERN.format(station=station)
+    derived = {k: getattr(args, k) for k in ("bin", "shards", "daily", "hdd")}
+    if any(derived.values()) and not update_archive.is_main_archive(archive):
+        ap.error(f"--bin/--shards/--daily/--hdd solo existen para {STATION} ({update_archive.ARCHIVE})")
+    if args.store:
+        paths = SnapshotStore(args.store).paths(station, args.since, args.until)
+    else:
+        paths = find_snapshots(args.root)
+    if not paths:
+        print(f"ERROR: no hay páginas en {args.root or args.store}", file=sys.stderr)
+        sys.exit(2)
+
+    t0 = time.monotonic()
+    by_ts, errors = parse_all(paths, args.workers, args.chunksize)
+    dt = time.monotonic() - t0
+    for path, err in errors:
+        print(f"WARN: {path}: {err}", file=sys.stderr)
+    print(f"INFO: {len(paths)} páginas en {dt:.1f}s ({len(paths) / dt:.1f}/s), "
+          f"{len(by_ts)} horas distintas, {len(errors)} con error")
+    if not by_ts or args.dry_run:
+        return
+
+    rows = csv_records(sorted(by_ts.items()))
+    update_archive.archive_rows(rows, path=archive, **derived)
+
+if __name__ == "__main__":
+    main()
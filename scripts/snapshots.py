@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Almacén de páginas AEMET tal como se descargaron, para poder repetir el
+parseo sin red cuando cambia el parser (ver reprocess.py --store).
+
+    .cache/snapshots/objects/ab/abcdef....html.gz   cuerpo comprimido, nombrado por su sha256
+    .cache/snapshots/index.csv                      fetched_utc,station,sha256,bytes (una línea por descarga)
+
+Las páginas idénticas se guardan una sola vez. Se comprime con zstd si está
+instalado 'zstandard' y si no con gzip; la lectura acepta ambos. En local vive
+bajo .cache/ (fuera de git). En el workflow se usa --snapshots .snapshots, un
+worktree de la rama huérfana 'snapshots' que se empuja tras cada captura: la
+caché de actions se borra a los 7 días sin uso y no sirve como archivo, y así
+las páginas tampoco entran en los commits de datos.
+
+Uso:
+    python scripts/snapshots.py stats [--root .cache/snapshots]
+    python scripts/snapshots.py list [--station 9091R] [--since 2025-01-01]
+    python scripts/snapshots.py export DIR [--station 9091R]
+"""
+import argparse, csv, gzip, hashlib, os, sys, threading
+from datetime import datetime, timezone
+
+SNAPSHOT_DIR = ".cache/snapshots"
+INDEX = "index.csv"
+INDEX_FIELDS = ["fetched_utc", "station", "sha256", "bytes"]
+GZIP_LEVEL = 9
+ZSTD_LEVEL = 19
+
+
+def _zstd():
+    try:
+        import zstandard
+    except ImportError:
+        return None
+    return zstandard
+
+
+class SnapshotStore:
+    def __init__(self, root=SNAPSHOT_DIR):
+        self.root = root
+        self.index_path = os.path.join(root, INDEX)
+        self._lock = threading.Lock()
+
+    def _blob(self, sha, ext):
+        return os.path.join(self.root, "objects", sha[:2], f"{sha}.html.{ext}")
+
+    def blob_path(self, sha):
+        for ext in ("zst", "gz"):
+            p = self._blob(sha, ext)
+            if os.path.exists(p):
+                return p
+        return None
+
+    def put(self, station, html: str, fetched=None):
+        """Guarda la página (si no estaba ya) y la anota en el índice. Devuelve su sha256."""
+        raw = html.encode("utf-8")
+        sha = hashlib.sha256(raw).hexdigest()
+        fetched = (fetched or datetime.now(timezone.utc)).strftime("%Y-%m-%dT%H:%M:%SZ")
+        with self._lock:
+            if self.blob_path(sha) is None:
+                zstd = _zstd()
+                if zstd is not None:
+                    path, data = self._blob(sha, "zst"), zstd.ZstdCompressor(level=ZSTD_LEVEL).compress(raw)
+                else:
+                    path, data = self._blob(sha, "gz"), gzip.compress(raw, GZIP_LEVEL, mtime=0)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp = f"{path}.{os.getpid()}.tmp"
+                with open(tmp, "wb") as f:
+                    f.write(data)
+                os.replace(tmp, path)
+            new_index = not os.path.exists(self.index_path)
+            os.makedirs(self.root, exist_ok=True)
+            with open(self.index_path, "a", encoding="utf-8", newline="") as f:
+                w = csv.writer(f)
+                if new_index:
+                    w.writerow(INDEX_FIELDS)
+                w.writerow([fetched, station, sha, len(raw)])
+        return sha
+
+    def get(self, sha) -> str:
+        path = self.blob_path(sha)
+        if path is None:
+            raise KeyError(sha)
+        return read_blob(path)
+
+    def entries(self, station=None, since=None, until=None):
+        """Filas del índice (dicts) en orden de descarga, filtradas por estación y fecha (prefijo ISO)."""
+        if not os.path.exists(self.index_path):
+            return []
+        with open(self.index_path, encoding="utf-8") as f:
+            rows = list(csv.DictReader(f))
+        return [
+            r for r in rows
+            if (station is None or r["station"] == station)
+            and (since is None or r["fetched_utc"] >= since)
+            and (until is None or r["fetched_utc"] < until)
+        ]
+
+    def paths(self, station=None, since=None, until=None):
+        """Blobs distintos en orden de su última descarga (para reprocess.parse_all)."""
+        last = {}
+        for i, r in enumerate(self.entries(station, since, until)):
+            last[r["sha256"]] = i
+        out = []
+        for sha in sorted(last, key=last.get):
+            p = self.blob_path(sha)
+            if p is None:
+                print(f"WARN: {sha} está en el índice pero no en {self.root}", file=sys.stderr)
+                continue
+            out.append(p)
+        return out
+
+
+def read_blob(path) -> str:
+    if path.endswith(".zst"):
+        zstd = _zstd()
+        if zstd is None:
+            raise RuntimeError(f"{path} está comprimido con zstd (pip install zstandard)")
+        with open(path, "rb") as f:
+            return zstd.ZstdDecompressor().decompress(f.read()).decode("utf-8", errors="replace")
+    with gzip.open(path, "rt", encoding="utf-8", errors="replace") as f:
+        return f.read()
+
+
+# ---------- Main ----------
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Almacén de páginas AEMET descargadas")
+    ap.add_argument("--root", default=SNAPSHOT_DIR)
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("stats", help="descargas, páginas distintas y espacio ocupado")
+    for name in ("list", "export"):
+        p = sub.add_parser(name)
+        if name == "export":
+            p.add_argument("dest", help="directorio donde escribir las páginas en claro")
+        p.add_argument("--station")
+        p.add_argument("--since", help="fecha/hora UTC ISO inicial (incluida)")
+        p.add_argument("--until", help="fecha/hora UTC ISO final (excluida)")
+    args = ap.parse_args(argv)
+    store = SnapshotStore(args.root)
+
+    if args.cmd == "stats":
+        rows = store.entries()
+        shas = {r["sha256"] for r in rows}
+        raw = sum(int(r["bytes"]) for r in {r["sha256"]: r for r in rows}.values())
+        stored = sum(os.path.getsize(p) for p in map(store.blob_path, shas) if p)
+        print(f"{len(rows)} descargas, {len(shas)} páginas distintas, "
+              f"{raw / 1e6:.1f} MB en claro -> {stored / 1e6:.1f} MB en disco")
+    elif args.cmd == "list":
+        for r in store.entries(args.station, args.since, args.until):
+            print(f"{r['fetched_utc']}  {r['station']:8s} {r['sha256'][:12]}  {r['bytes']:>8s}")
+    elif args.cmd == "export":
+        os.makedirs(args.dest, exist_ok=True)
+        rows = store.entries(args.station, args.since, args.until)
+        for r in rows:
+            name = f"{r['station']}_{r['fetched_utc'].replace(':', '')}.html"
+            with open(os.path.join(args.dest, name), "w", encoding="utf-8") as f:
+                f.write(store.get(r["sha256"]))
+        print(f"OK: {len(rows)} páginas -> {args.dest}")
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,13 @@
 #!/usr/bin/env python3
-import csv, os
+import argparse, csv, hashlib, io, os
+
+import archive_bin, archive_daily, archive_shards, degree_days
 
 HOURLY = "docs/data/9091R_temp_hourly.csv"
 ARCHIVE = "docs/data/9091R_temp_history.csv"
+ARCHIVE_PATTERN = "docs/data/{station}_temp_history.csv"  # histórico de cada estación (ARCHIVE para 9091R)
+FIELDS = ["date_local","time_local","datetime_utc","temp_c","source"]
+TAIL_CHUNK = 64 * 1024  # bytes leídos hacia atrás en cada paso al buscar la cola
 
 def read_csv(path):
     if not os.path.exists(path): return []
@@ -10,27 +15,209 @@ def read_csv(path):
         r = csv.DictReader(f)
         return list(r)
 
-def write_csv(path, rows):
-    fields = ["date_local","time_local","datetime_utc","temp_c","source"]
+def write_csv(path, rows, fields=FIELDS):
     with open(path, "w", encoding="utf-8", newline="") as f:
         w = csv.DictWriter(f, fieldnames=fields)
         w.writeheader()
         w.writerows(rows)
 
-def main():
-    hourly = read_csv(HOURLY)
-    if not hourly:
-        print("WARN: hourly vacío, nada que archivar"); return
+def _rows_to_bytes(rows, fields=FIELDS):
+    buf = io.StringIO()
+    csv.DictWriter(buf, fieldnames=fields).writerows(rows)
+    return buf.getvalue().encode("utf-8")
 
-    arch = read_csv(ARCHIVE)
+def _line_key(line: bytes):
+    """datetime_utc de una línea cruda del CSV (None si es cabecera o no parsea)."""
+    parts = next(csv.reader([line.decode("utf-8")]), [])
+    if len(parts) < len(FIELDS) or parts[0] == FIELDS[0]:
+        return None
+    return parts[2]
+
+# ---------- Merge completo (O(tamaño del histórico)) ----------
+def merge_full(hourly, path=ARCHIVE, fields=FIELDS):
+    arch = read_csv(path)
     by_key = { r["datetime_utc"]: r for r in arch }  # existente
     for r in hourly:
         by_key[r["datetime_utc"]] = r  # inserta/actualiza
 
     merged = list(by_key.values())
     merged.sort(key=lambda r: r["datetime_utc"])
-    write_csv(ARCHIVE, merged)
-    print(f"OK: histórico actualizado con {len(hourly)} nuevas/actualizadas; total={len(merged)}")
+    write_csv(path, merged, fields)
+    return len(merged)
+
+# ---------- Merge incremental (sólo la cola solapada) ----------
+def _find_tail_offset(f, min_key):
+    """
+    Recorre el histórico (ordenado por datetime_utc) desde el final hacia atrás
+    y devuelve el offset en bytes justo tras la última línea con clave < min_key.
+    Devuelve None si no hay ninguna (el solape alcanza el principio del fichero).
+    """
+    f.seek(0, os.SEEK_END)
+    pos = f.tell()
+    buf = b""
+    while pos > 0:
+        step = min(TAIL_CHUNK, pos)
+        pos -= step
+        f.seek(pos)
+        buf = f.read(step) + buf
+        lines = buf.split(b"\n")
+        starts, s = [], pos
+        for ln in lines:
+            starts.append(s); s += len(ln) + 1
+        # la primera línea puede estar cortada salvo que hayamos llegado al inicio
+        first = 0 if pos == 0 else 1
+        for i in range(len(lines) - 1, first - 1, -1):
+            key = _line_key(lines[i].rstrip(b"\r"))
+            if key is not None and key < min_key:
+                return starts[i] + len(lines[i]) + 1
+        # conservamos sólo el fragmento incompleto para la siguiente vuelta
+        buf = lines[0] if first else b""
+    return None
+
+def merge_incremental(hourly, path=ARCHIVE, fields=FIELDS):
+    """
+    Reescribe únicamente la ventana final del histórico que puede colisionar
+    con las filas horarias y añade el resto. Coste proporcional al solape,
+    no al tamaño del archivo. Devuelve el nº de filas reescritas/añadidas,
+    o None si hay que caer al merge completo.
+    """
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return None
+    min_key = min(r["datetime_utc"] for r in hourly)
+    with open(path, "r+b") as f:
+        offset = _find_tail_offset(f, min_key)
+        if offset is None:
+            return None
+        size = f.seek(0, os.SEEK_END)
+        sep = b""
+        if offset > size:  # última línea sin salto final
+            offset, sep = size, b"\r\n"
+        f.seek(offset)
+        tail = f.read().decode("utf-8")
+        by_key = { r["datetime_utc"]: r for r in csv.DictReader(io.StringIO(tail), fieldnames=fields) if r["datetime_utc"] }
+        for r in hourly:
+            by_key[r["datetime_utc"]] = r
+        merged = [by_key[k] for k in sorted(by_key)]
+        f.seek(offset)
+        f.truncate()
+        f.write(sep + _rows_to_bytes(merged, fields))
+    return len(merged)
+
+def read_tail(min_key, path=ARCHIVE, fields=FIELDS):
+    """Filas del histórico con datetime_utc >= min_key, leyendo solo la cola."""
+    if not os.path.exists(path): return []
+    with open(path, "rb") as f:
+        offset = _find_tail_offset(f, min_key)
+        if offset is not None:
+            f.seek(offset)
+            rows = csv.DictReader(io.StringIO(f.read().decode("utf-8")), fieldnames=fields)
+            return [r for r in rows if r["datetime_utc"]]
+    return [r for r in read_csv(path) if r["datetime_utc"] >= min_key]
+
+def _fingerprint(rows, fields=FIELDS):
+    """Huella de un conjunto de filas (todas las columnas), independiente del orden."""
+    h = hashlib.sha256()
+    for key in sorted(tuple(r.get(f) or "" for f in fields) for r in rows):
+        h.update(",".join(key).encode("utf-8") + b"\n")
+    return h.hexdigest()
+
+def already_archived(hourly, path=ARCHIVE, fields=FIELDS):
+    """True si todas las filas horarias ya están, idénticas, en la cola del histórico."""
+    keys = {r["datetime_utc"] for r in hourly}
+    tail = [r for r in read_tail(min(keys), path, fields) if r["datetime_utc"] in keys]
+    return len(tail) == len(keys) and _fingerprint(tail, fields) == _fingerprint(hourly, fields)
+
+def merge_rows(rows, path=ARCHIVE, fields=FIELDS):
+    """Fusión incremental (o completa si no se puede) salvo no-op. True si el histórico cambió."""
+    if already_archived(rows, path, fields):
+        return False
+    if merge_incremental(rows, path, fields) is None:
+        merge_full(rows, path, fields)
+    return True
+
+def is_main_archive(path) -> bool:
+    """True si `path` es ARCHIVE, el único histórico con salidas derivadas (9091R)."""
+    return os.path.abspath(path) == os.path.abspath(ARCHIVE)
+
+def _derived_outputs(bin=False, shards=False, daily=False, hdd=False):
+    out = []
+    if bin: out.append(archive_bin.ARCHIVE_BIN)
+    if shards: out.append(os.path.join(archive_shards.SHARD_DIR, archive_shards.MANIFEST))
+    if daily: out.append(archive_daily.DAILY)
+    if hdd: out.append(degree_days.OUT_PATTERN.format(period="day"))
+    return out
+
+def archive_rows(hourly, full=False, bin=False, shards=False, daily=False, hdd=False, path=ARCHIVE):
+    """
+    Fusiona filas horarias (dicts con FIELDS) en el histórico y en las salidas
+    derivadas pedidas. Devuelve False si no había nada nuevo que archivar.
+    Las salidas derivadas tienen rutas fijas de 9091R, así que solo se admiten
+    con path=ARCHIVE: con otro histórico se reconstruirían a partir de él.
+    """
+    if (bin or shards or daily or hdd) and not is_main_archive(path):
+        raise RuntimeError(f"--bin/--shards/--daily/--hdd solo se mantienen para {ARCHIVE}, no para {path}")
+    if not full and all(os.path.exists(p) for p in _derived_outputs(bin, shards, daily, hdd)) and already_archived(hourly, path):
+        print(f"OK: no-op, las {len(hourly)} filas horarias ya están en el histórico"); return False
+
+    tail = None if full else merge_incremental(hourly, path)
+    if tail is None:
+        total = merge_full(hourly, path)
+        print(f"OK: histórico actualizado con {len(hourly)} nuevas/actualizadas; total={total}")
+    else:
+        print(f"OK: histórico actualizado con {len(hourly)} nuevas/actualizadas; cola reescrita={tail} filas")
+
+    if bin:
+        n = None if full else archive_bin.merge_bin([archive_bin.row_to_record(r) for r in hourly])
+        if n is None:
+            n = archive_bin.build_from_csv(path)
+        print(f"OK: binario {archive_bin.ARCHIVE_BIN} actualizado ({n} registros reescritos)")
+
+    if shards:
+        months = None if full else archive_shards.merge_shards(hourly)
+        if months is None:
+            months = sorted(archive_shards.build_from_csv(path))
+        print(f"OK: shards {archive_shards.SHARD_DIR} actualizados: {', '.join(months)}")
+
+    if daily:
+        days = sorted({r["date_local"] for r in hourly})
+        touched = None
+        if not full:
+            rows = read_tail(archive_daily.day_start_utc(days[0]), path)
+            touched = archive_daily.merge_daily(rows, days)
+        if touched is None:
+            touched = sorted(archive_daily.build_from_csv(path))
+        print(f"OK: agregados diarios {archive_daily.DAILY}: {len(touched)} días recalculados")
+
+    if hdd:
+        days = sorted({r["date_local"] for r in hourly})
+        touched = None
+        if not full:
+            rows = read_tail(archive_daily.day_start_utc(days[0]), path)
+            touched = degree_days.merge(rows, days)
+        if touched is None:
+            touched = sorted(degree_days.build_from_csv(path))
+        print(f"OK: grados-día de calefacción: {len(touched)} días recalculados")
+    return True
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Fusiona el CSV horario en el histórico")
+    ap.add_argument("--full", action="store_true", help="relee y reescribe el histórico completo")
+    ap.add_argument("--bin", action="store_true", help=f"mantiene también {archive_bin.ARCHIVE_BIN}")
+    ap.add_argument("--shards", action="store_true", help=f"mantiene también los shards mensuales de {archive_shards.SHARD_DIR}")
+    ap.add_argument("--daily", action="store_true", help=f"mantiene también los agregados diarios {archive_daily.DAILY}")
+    ap.add_argument("--hdd", action="store_true", help="mantiene también los grados-hora/grados-día de calefacción")
+    ap.add_argument("--hourly", default=HOURLY, help="CSV horario de entrada")
+    ap.add_argument("--archive", default=ARCHIVE, help="histórico a actualizar")
+    args = ap.parse_args(argv)
+    if (args.bin or args.shards or args.daily or args.hdd) and not is_main_archive(args.archive):
+        ap.error(f"--bin/--shards/--daily/--hdd solo se mantienen para {ARCHIVE}")
+
+    hourly = read_csv(args.hourly)
+    if not hourly:
+        print("WARN: hourly vacío, nada que archivar"); return
+
+    archive_rows(hourly, full=args.full, bin=args.bin, shards=args.shards, daily=args.daily, hdd=args.hdd,
+                 path=args.archive)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,4 @@
+import os, sys
+
+# los scripts se importan entre sí como módulos sueltos (ver scripts/)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts"))
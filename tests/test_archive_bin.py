@@ -0,0 +1,65 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import archive_bin, update_archive
+from archive_bin import BinArchive, record_to_pair, row_to_record
+from fetch_aemet_9091R import csv_records
+
+T0 = datetime(2025, 3, 1, tzinfo=timezone.utc)
+PAIRS = [(T0 + timedelta(hours=i), round(-3 + i * 0.7, 1)) for i in range(48) if i not in (10, 11, 30)]
+
+
+@pytest.fixture
+def bin_path(tmp_path):
+    csv_path = tmp_path / "history.csv"
+    update_archive.write_csv(str(csv_path), csv_records(PAIRS))
+    path = tmp_path / "history.bin"
+    archive_bin.build_from_csv(str(csv_path), str(path))
+    return str(path)
+
+
+def test_records_round_trip(bin_path):
+    with BinArchive(bin_path) as arch:
+        assert len(arch) == len(PAIRS)
+        assert [record_to_pair(arch.record(i)) for i in range(len(arch))] == PAIRS
+
+@pytest.mark.parametrize("start, end", [
+    (None, None),
+    (T0, T0 + timedelta(hours=5)),
+    (T0 + timedelta(hours=10), T0 + timedelta(hours=12)),       # empieza en el hueco
+    (T0 - timedelta(days=1), T0 + timedelta(hours=1)),
+    (T0 + timedelta(hours=47), None),
+    (T0 + timedelta(days=5), None),
+    (T0 + timedelta(hours=11), T0 + timedelta(hours=11)),
+])
+def test_slice_matches_filter(bin_path, start, end):
+    expected = [p for p in PAIRS if (start is None or p[0] >= start) and (end is None or p[0] < end)]
+    with BinArchive(bin_path) as arch:
+        assert [record_to_pair(r) for r in arch.slice(start, end)] == expected
+
+def test_slice_partial_hours(bin_path):
+    """Cada registro es una hora entera: basta con que solape [start, end)."""
+    with BinArchive(bin_path) as arch:
+        got = arch.slice(T0 + timedelta(hours=9, minutes=30), T0 + timedelta(hours=20, minutes=1))
+    assert [record_to_pair(r) for r in got] == [p for p in PAIRS if T0 + timedelta(hours=9) <= p[0] <= T0 + timedelta(hours=20)]
+
+def test_merge_bin_matches_rebuild(tmp_path, bin_path):
+    new = csv_records([(T0 + timedelta(hours=i), 20.0 + i / 10) for i in range(28, 60)])
+    archive_bin.merge_bin([row_to_record(r) for r in new], bin_path)
+
+    merged = dict(PAIRS)
+    merged.update((T0 + timedelta(hours=i), 20.0 + i / 10) for i in range(28, 60))
+    csv_path = tmp_path / "rebuilt.csv"
+    update_archive.write_csv(str(csv_path), csv_records(sorted(merged.items())))
+    rebuilt = tmp_path / "rebuilt.bin"
+    archive_bin.build_from_csv(str(csv_path), str(rebuilt))
+
+    with open(bin_path, "rb") as f:
+        assert f.read() == rebuilt.read_bytes()
+
+def test_rejects_foreign_file(tmp_path):
+    path = tmp_path / "x.bin"
+    path.write_bytes(b"not a bin archive")
+    with pytest.raises(RuntimeError):
+        BinArchive(str(path))
@@ -0,0 +1,48 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import archive_daily, update_archive
+from fetch_aemet_9091R import csv_records
+
+T0 = datetime(2025, 10, 20, tzinfo=timezone.utc)
+
+
+def records(start, n, offset=0.0):
+    return csv_records([(T0 + timedelta(hours=start + i), round(8 + (i * 11 % 120) / 10 + offset, 1)) for i in range(n)])
+
+
+def test_day_start_utc():
+    assert archive_daily.day_start_utc("2025-07-01") == "2025-06-30T22:00:00Z"
+    assert archive_daily.day_start_utc("2025-12-01") == "2025-11-30T23:00:00Z"
+    assert archive_daily.day_start_utc("2025-10-26") == "2025-10-25T22:00:00Z"
+
+@pytest.mark.parametrize("start, n", [
+    (24 * 5, 24),       # del 25 al 26-oct: cruza el cambio de hora (día de 25 h)
+    (24 * 9 - 3, 40),   # solapa la cola y añade días nuevos
+    (24 * 2 + 7, 1),    # una sola hora a media mañana
+])
+def test_merge_daily_matches_rebuild(tmp_path, start, n):
+    """Mismo camino que update_archive.archive_rows: merge, read_tail del primer día y merge_daily."""
+    csv_path, daily = str(tmp_path / "history.csv"), str(tmp_path / "daily.csv")
+    update_archive.write_csv(csv_path, records(0, 24 * 10))
+    archive_daily.build_from_csv(csv_path, daily)
+
+    hourly = records(start, n, offset=-0.7)
+    update_archive.merge_full(hourly, csv_path)
+    days = sorted({r["date_local"] for r in hourly})
+    rows = update_archive.read_tail(archive_daily.day_start_utc(days[0]), csv_path)
+    assert archive_daily.merge_daily(rows, days, daily) == days
+
+    rebuilt = str(tmp_path / "rebuilt.csv")
+    archive_daily.build_from_csv(csv_path, rebuilt)
+    with open(daily, encoding="utf-8") as a, open(rebuilt, encoding="utf-8") as b:
+        assert a.read() == b.read()
+
+def test_dst_day_has_25_hours():
+    by_day = archive_daily.aggregate(records(0, 24 * 10))
+    assert by_day["2025-10-26"]["count"] == 25
+    assert by_day["2025-10-25"]["count"] == 24
+
+def test_merge_daily_needs_file(tmp_path):
+    assert archive_daily.merge_daily(records(0, 3), ["2025-10-20"], str(tmp_path / "daily.csv")) is None
@@ -0,0 +1,49 @@
+import json, os
+from datetime import datetime, timedelta, timezone
+
+import archive_shards, update_archive
+from fetch_aemet_9091R import csv_records
+
+T0 = datetime(2025, 1, 29, tzinfo=timezone.utc)
+
+
+def records(start, n, offset=0.0):
+    return csv_records([(T0 + timedelta(hours=start + i), round(5 + (i * 13 % 90) / 10 + offset, 1)) for i in range(n)])
+
+def read_dir(shard_dir):
+    """{ fichero: contenido } con el manifest sin la marca de tiempo."""
+    out = {}
+    for name in sorted(os.listdir(shard_dir)):
+        with open(os.path.join(shard_dir, name), encoding="utf-8") as f:
+            out[name] = f.read()
+    manifest = json.loads(out.pop(archive_shards.MANIFEST))
+    manifest.pop("updated_utc")
+    return out, manifest
+
+
+def test_merge_shards_matches_rebuild(tmp_path):
+    """Filas nuevas y solapadas que cruzan el cambio de mes (enero-febrero-marzo)."""
+    csv_path, shard_dir = str(tmp_path / "history.csv"), str(tmp_path / "shards")
+    update_archive.write_csv(csv_path, records(0, 24 * 20))
+    archive_shards.build_from_csv(csv_path, shard_dir)
+
+    hourly = records(24 * 20 - 30, 24 * 30, offset=0.3)
+    months = archive_shards.merge_shards(hourly, shard_dir)
+    assert months == ["2025-02", "2025-03"]
+
+    update_archive.merge_full(hourly, csv_path)
+    rebuilt = str(tmp_path / "rebuilt")
+    archive_shards.build_from_csv(csv_path, rebuilt)
+    assert read_dir(shard_dir) == read_dir(rebuilt)
+
+def test_merge_shards_needs_manifest(tmp_path):
+    assert archive_shards.merge_shards(records(0, 3), str(tmp_path)) is None
+
+def test_shards_for_range(tmp_path):
+    csv_path, shard_dir = str(tmp_path / "history.csv"), str(tmp_path / "shards")
+    update_archive.write_csv(csv_path, records(0, 24 * 40))
+    archive_shards.build_from_csv(csv_path, shard_dir)
+    names = lambda *a: [os.path.basename(p) for p in archive_shards.shards_for_range(*a, shard_dir=shard_dir)]
+    assert names() == ["2025-01.csv", "2025-02.csv", "2025-03.csv"]
+    assert names("2025-02-10T00:00:00Z", "2025-02-11T00:00:00Z") == ["2025-02.csv"]
+    assert names("2025-01-31T23:00:00Z", "2025-02-01T00:00:00Z") == ["2025-01.csv", "2025-02.csv"]
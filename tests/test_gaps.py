@@ -0,0 +1,52 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from gaps import HOUR, _iso, _missing_keys, find_gaps, n_hours, split_recoverable
+
+T0 = datetime(2025, 6, 1, tzinfo=timezone.utc)
+
+
+def h(i, minutes=0):
+    return T0 + timedelta(hours=i, minutes=minutes)
+
+def keys(*hours):
+    return [_iso(h(i)) for i in hours]
+
+
+@pytest.mark.parametrize("present, until, expected", [
+    ((0, 1, 2, 3), h(3), []),
+    ((0, 1, 4, 5), h(5), [(h(2), h(3))]),
+    ((0, 2, 3, 7), h(7), [(h(1), h(1)), (h(4), h(6))]),
+    ((0, 1), h(4), [(h(2), h(4))]),                 # hueco final hasta `until`
+    ((0, 1), h(1, 30), []),                          # menos de una hora tras la última
+    ((), h(5), []),                                  # sin datos no hay referencia
+    ((0, 0, 1, 3), h(3), [(h(2), h(2))]),            # claves repetidas
+])
+def test_find_gaps(present, until, expected):
+    assert find_gaps(keys(*present), until) == expected
+
+def test_find_gaps_ignores_minutes_off_the_hour():
+    """Una observación a media hora no abre un hueco mientras la siguiente llegue dentro de la hora."""
+    ks = [_iso(h(0)), _iso(h(0, 30)), _iso(h(1, 20)), _iso(h(2))]
+    assert find_gaps(ks, h(2)) == []
+
+def test_split_recoverable():
+    now = h(48, 20)   # límite de 24 h: h(24, 20)
+    gaps = [(h(2), h(5)), (h(20), h(30)), (h(40), h(47))]
+    rec, lost = split_recoverable(gaps, now)
+    assert lost == [(h(2), h(5)), (h(20), h(24))]
+    assert rec == [(h(25), h(30)), (h(40), h(47))]
+
+def test_split_recoverable_on_the_hour():
+    rec, lost = split_recoverable([(h(20), h(30))], h(48))
+    assert lost == [(h(20), h(23))]
+    assert rec == [(h(24), h(30))]
+
+def test_split_keeps_every_hour():
+    gaps = find_gaps(keys(0, 3, 9, 30, 31, 45), h(50))
+    rec, lost = split_recoverable(gaps, h(50, 10))
+    assert n_hours(rec) + n_hours(lost) == n_hours(gaps)
+    missing = _missing_keys([[_iso(a), _iso(b)] for a, b in rec + lost])
+    assert missing == {_iso(h(i)) for i in range(51)} - set(keys(0, 3, 9, 30, 31, 45))
+    assert all(b - a >= timedelta(0) and (b - a) % HOUR == timedelta(0) for a, b in rec + lost)
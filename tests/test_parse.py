@@ -0,0 +1,66 @@
+from datetime import datetime, timezone
+
+import pytest
+
+import fetch_aemet_9091R
+from fetch_aemet_9091R import parse_aemet_html_both, parse_aemet_html_last24, wide_records
+from mock_aemet import HEADERS_ROW
+
+BACKENDS = ["bs4", "stream"]
+
+
+@pytest.fixture(autouse=True)
+def no_layout_cache(monkeypatch):
+    monkeypatch.setattr(fetch_aemet_9091R, "LAYOUT_CACHE", None)
+    monkeypatch.setattr(fetch_aemet_9091R, "_layouts", {})
+
+def utc(*a):
+    return datetime(*a, tzinfo=timezone.utc)
+
+def page(*rows):
+    """Página con la tabla de AEMET; cada fila: fecha, temperatura, precipitación, presión, humedad."""
+    trs = "".join(
+        "<tr>" + "".join(f"<td>{v}</td>" for v in (fecha, temp, "3", "Norte", "7", "Norte", precip, pres, "0,1", hr)) + "</tr>"
+        for fecha, temp, precip, pres, hr in rows
+    )
+    ths = "".join(f"<th>{h}</th>" for h in HEADERS_ROW)
+    return (f"<html><body><table class='tabla_datos'><thead><tr>{ths}</tr></thead>"
+            f"<tbody>{trs}</tbody></table></body></html>")
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+@pytest.mark.parametrize("order", [(0, 1), (1, 0)])
+def test_dst_repeated_hour(backend, order):
+    """
+    26-oct-2025: las 02:00 locales aparecen dos veces; una sin temperatura.
+    En cualquier orden queda una sola hora, con la temperatura que sí hay.
+    """
+    repeated = [("26/10/2025 02:00", "4,5", "0,0", "1014,9", "82"),
+                ("26/10/2025 02:00", "-", "0,0", "1015,2", "81")]
+    html = page(
+        ("26/10/2025 03:00", "5,0", "0,0", "1015,0", "80"),
+        *(repeated[i] for i in order),
+        ("26/10/2025 01:00", "4,8", "Ip", "1.014,8", "83"),
+    )
+    pairs, wide = parse_aemet_html_both(html, backend)
+    assert pairs == parse_aemet_html_last24(html, backend)
+    assert pairs == [(utc(2025, 10, 25, 23), 4.8), (utc(2025, 10, 26, 0), 4.5), (utc(2025, 10, 26, 2), 5.0)]
+    assert [ts for ts, _ in wide] == [ts for ts, _ in pairs]
+
+    recs = wide_records(wide)
+    assert [(r["date_local"], r["time_local"]) for r in recs] == [
+        ("2025-10-26", "01:00"), ("2025-10-26", "02:00"), ("2025-10-26", "03:00"),
+    ]
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_wide_column_parsers(backend):
+    _, wide = parse_aemet_html_both(page(
+        ("01/02/2025 10:00", "12,3", "Ip", "1.014,8", "85"),
+        ("01/02/2025 11:00", "ND", "2,4", "1013", "-"),
+    ), backend)
+    assert wide == [
+        (utc(2025, 2, 1, 9), {"temp_c": 12.3, "wind_kmh": 3.0, "gust_kmh": 7.0, "precip_mm": 0.0,
+                              "pressure_trend_hpa": 0.1, "pressure_hpa": 1014.8, "rh_pct": 85.0}),
+        (utc(2025, 2, 1, 10), {"temp_c": None, "wind_kmh": 3.0, "gust_kmh": 7.0, "precip_mm": 2.4,
+                               "pressure_trend_hpa": 0.1, "pressure_hpa": 1013.0, "rh_pct": None}),
+    ]
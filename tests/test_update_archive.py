@@ -0,0 +1,60 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import update_archive
+from fetch_aemet_9091R import csv_records
+
+T0 = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+def records(n, start=0, offset=0.0):
+    return csv_records([(T0 + timedelta(hours=start + i), round(-5 + (i * 7 % 300) / 10 + offset, 1)) for i in range(n)])
+
+def write_archive(path, rows, trailing_newline=True):
+    update_archive.write_csv(path, rows)
+    if not trailing_newline:
+        with open(path, "rb+") as f:
+            f.truncate(f.seek(0, 2) - 2)  # quita el último "\r\n"
+
+
+@pytest.mark.parametrize("trailing_newline", [True, False])
+@pytest.mark.parametrize("start", [0, 80, 90, 100, 120])
+def test_incremental_equals_full(tmp_path, start, trailing_newline):
+    """Solape desde el principio, parcial, solo la última fila y sin solape."""
+    base = records(100)
+    hourly = records(24, start=start, offset=0.5)
+    inc, full = tmp_path / "inc.csv", tmp_path / "full.csv"
+    for p in (inc, full):
+        write_archive(p, base, trailing_newline)
+
+    if update_archive.merge_incremental(hourly, str(inc)) is None:
+        update_archive.merge_full(hourly, str(inc))
+    update_archive.merge_full(hourly, str(full))
+
+    assert inc.read_bytes() == full.read_bytes()
+
+def test_incremental_falls_back_when_overlap_reaches_start(tmp_path):
+    path = tmp_path / "a.csv"
+    write_archive(path, records(10, start=5))
+    assert update_archive.merge_incremental(records(24), str(path)) is None
+
+
+@pytest.mark.parametrize("chunk", [7, 31, 64, 97, 4096])
+def test_find_tail_offset_across_chunks(tmp_path, monkeypatch, chunk):
+    """Con trozos más cortos que una línea o que la parten, el offset no cambia."""
+    path = tmp_path / "a.csv"
+    rows = records(60)
+    write_archive(path, rows)
+    data = path.read_bytes()
+    monkeypatch.setattr(update_archive, "TAIL_CHUNK", chunk)
+
+    for i in (1, 2, 30, 59):
+        key = rows[i]["datetime_utc"]
+        with open(path, "rb") as f:
+            offset = update_archive._find_tail_offset(f, key)
+        assert data[offset:].startswith(f"{rows[i]['date_local']},".encode())
+        assert update_archive._line_key(data[:offset].splitlines()[-1]) == rows[i - 1]["datetime_utc"]
+
+    with open(path, "rb") as f:
+        assert update_archive._find_tail_offset(f, rows[0]["datetime_utc"]) is None